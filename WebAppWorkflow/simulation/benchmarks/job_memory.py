@@ -0,0 +1,55 @@
+import os
+import sys
+from array import array
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from sim_config import SEED, ARRIVAL_RATE, ARRIVAL_STREAM
+from src.entities import Clock, EventCalendar, TRACE_LEVELS
+from src.simulator import simulate_batch, make_servers, ROUTES, STREAMS, SERVER_NAMES
+from src.utils import replication_streams
+
+NUM_JOBS = 20000
+
+
+# Byte occupati da obj e da tutto ciò che contiene (una volta sola per oggetto).
+# Nomi di server e classi, None e interi piccoli sono condivisi tra tutti i job
+# e non contano
+def deep_size(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if obj is None or isinstance(obj, (str, bool)) or (type(obj) is int and -5 <= obj <= 256) or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif hasattr(obj, '__dict__'):
+        size += deep_size(obj.__dict__, seen)
+    elif hasattr(obj, '__slots__'):
+        for slot in obj.__slots__:
+            size += deep_size(getattr(obj, slot, None), seen)
+    return size
+
+
+# Memoria media di un job in volo (dentro un server) dopo NUM_JOBS completamenti,
+# con il livello di tracciamento trace
+def bytes_per_live_job(trace, num_jobs=NUM_JOBS):
+    arrival_stream, service_streams = replication_streams(SEED, 0, ARRIVAL_STREAM, STREAMS)
+    servers = make_servers()
+    calendar = EventCalendar(SERVER_NAMES)
+
+    _, _, in_flight, _, _ = simulate_batch(num_jobs, ARRIVAL_RATE, ROUTES, arrival_stream,
+                                           service_streams, servers, calendar, Clock(), {}, trace)
+    jobs = list(in_flight.values())
+    return sum(deep_size(job) for job in jobs) / len(jobs), len(jobs)
+
+
+if __name__ == "__main__":
+    for name in ('aggregates', 'full'):
+        size, n_jobs = bytes_per_live_job(TRACE_LEVELS[name])
+        print(f"Memoria per job in volo (tracciamento {name}, {n_jobs} job): {size:.1f} byte")
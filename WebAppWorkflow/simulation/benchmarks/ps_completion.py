@@ -0,0 +1,40 @@
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from src.entities import PSServer, Job
+
+POPULATIONS = (10, 100, 1000, 10000)
+NUM_COMPLETIONS = 20000
+MEAN_SERVICE = 0.8   # service demand di B (Class1)
+
+
+# Costo medio di un completamento con popolazione costante pari a n:
+# ogni completamento è seguito da un nuovo arrivo, come a regime sul server B
+def completion_cost(n, num_completions=NUM_COMPLETIONS, seed=12345):
+    rnd = random.Random(seed)
+    srv = PSServer("B")
+    now = 0.0
+    for _ in range(n):
+        srv.process_arrival(Job(now), rnd.expovariate(1.0 / MEAN_SERVICE))
+
+    start = time.perf_counter()
+    for _ in range(num_completions):
+        now = srv.next_departure_time(now)
+        srv.update_progress(now)
+        srv.process_completion()
+        srv.process_arrival(Job(now), rnd.expovariate(1.0 / MEAN_SERVICE))
+    elapsed = time.perf_counter() - start
+
+    return elapsed / num_completions
+
+
+if __name__ == "__main__":
+    print(f"{'Job nel server':>15} | {'Costo per completamento':>24}")
+    for n in POPULATIONS:
+        cost = completion_cost(n)
+        print(f"{n:>15} | {cost * 1e6:>21.2f} µs")
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from lib.DES import rngs, rvgs
+from src.utils import exp_sample
+
+SEED = 987654321
+NUM_DRAWS = 200000
+STREAMS = (0, 1, 2, 3)   # arrivi + server A, B, P
+MEAN = 0.8
+
+
+# Costo medio per variata del ciclo loop(sequence), con la sequenza degli stream
+# che cicla come nel simulatore; le estrazioni sono scritte nel ciclo come nel
+# simulatore, senza una chiamata di funzione in più per variata
+def time_draws(loop, streams, num_draws):
+    sequence = [streams[i % len(streams)] for i in range(num_draws)]
+    start = time.perf_counter()
+    loop(sequence)
+    return (time.perf_counter() - start) / num_draws
+
+
+# Vecchio schema: selectStream + estrazione dallo stream globale
+def old_uniform(sequence):
+    for s in sequence:
+        rngs.selectStream(s)
+        rngs.random()
+
+def old_exponential(sequence):
+    for s in sequence:
+        rngs.selectStream(s)
+        rvgs.Exponential(MEAN)
+
+
+# Nuovo schema: un rngs.Stream a blocchi per ciascuno stream
+def new_uniform(sequence):
+    for stream in sequence:
+        stream.random()
+
+def new_exponential(sequence):
+    for stream in sequence:
+        exp_sample(MEAN, stream)
+
+
+if __name__ == "__main__":
+    rngs.plantSeeds(SEED)
+    streams = [rngs.getStream(s) for s in STREAMS]
+
+    for label, old, new in (("Uniform", old_uniform, new_uniform),
+                            ("Exponential", old_exponential, new_exponential)):
+        t_old = time_draws(old, STREAMS, NUM_DRAWS)
+        t_new = time_draws(new, streams, NUM_DRAWS)
+        print(f"{label}:")
+        print(f"  selectStream + stream globale: {t_old * 1e9:8.1f} ns/variata")
+        print(f"  rngs.Stream (blocchi da {rngs.BLOCK}):  {t_new * 1e9:8.1f} ns/variata")
+        print(f"  Speed-up: {t_old / t_new:.1f}x")
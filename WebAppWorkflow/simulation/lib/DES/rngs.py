@@ -35,8 +35,12 @@
 #  *
 #  * ------------------------------------------------------------------------- 
 
+from itertools import chain
+from operator import length_hint
 from time import time
 
+import numpy as np
+
 #global consts
 MODULUS = 2147483647 #/* DON'T CHANGE THIS VALUE                  */
 MULTIPLIER = 48271      #/* DON'T CHANGE THIS VALUE                  */
@@ -44,121 +48,249 @@ CHECK = 399268537  #/* DON'T CHANGE THIS VALUE                  */
 STREAMS = 256        #/* # of streams, DON'T CHANGE THIS VALUE    */
 A256 = 22925      #/* jump multiplier, DON'T CHANGE THIS VALUE */
 DEFAULT = 123456789  #/* initial seed, use 0 < DEFAULT < MODULUS  */
+BLOCK = 4096         #/* uniforms generated per block by Stream    */
 
-#statics
-stream = 0
-initialized = 0
-seed = [DEFAULT]
-for i in range(1,STREAMS):
-  seed.append(DEFAULT)
-
-
-def random(): 
-  #/* ---------------------------------------------------------------------
-  #* Random is a Lehmer generator that returns a pseudo-random real number
-  #* uniformly distributed between 0.0 and 1.0.  The period is (m - 1)
-  #* where m = 2,147,483,647 amd the smallest and largest possible values
-  #* are (1 / m) and 1 - (1 / m) respectively.
-  #* ---------------------------------------------------------------------
-  #*/
-  global seed
-
-  Q = int(MODULUS / MULTIPLIER)
-  R = int(MODULUS % MULTIPLIER)
-
-  t = int(MULTIPLIER * (seed[stream] % Q) - R * int(seed[stream] / Q))
-  if (t > 0):
-    seed[stream] = int(t)
-  else:
-    seed[stream] = int(t + MODULUS)
-
-  return float(seed[stream] / MODULUS)
-
-def plantSeeds(x): 
-  # /* --------------------------------------------------------------------
-  #  * Use this function to set the state of all the random number generator
-  #  * streams by "planting" a sequence of states (seeds), one per stream,
-  #  * with all states dictated by the state of the default stream.
-  #  * The sequence of planted states is separated one from the next by
-  #  * 8,367,782 calls to Random().
-  #  * ---------------------------------------------------------------------
+Q = MODULUS // MULTIPLIER          #/* Schrage factorization of MULTIPLIER */
+R = MODULUS % MULTIPLIER
+Q256 = MODULUS // A256             #/* Schrage factorization of A256       */
+R256 = MODULUS % A256
+
+
+def blockMultipliers(n):
+  # /* ------------------------------------------------------------------
+  #  * Returns the n jump multipliers MULTIPLIER^i mod MODULUS, i = 1..n,
+  #  * as a NumPy int64 array.  Each one is < 2^31, so multiplying it by
+  #  * a state (< 2^31) never exceeds 2^62 and is exact in 64 bits.
+  #  * ------------------------------------------------------------------
   #  */
-  global initialized
-  global stream
-  global seed
-
-  Q = int(MODULUS / A256)
-  R = int(MODULUS % A256)
-
-  initialized = 1
-  s = stream                             #/* remember the current stream */
-  selectStream(0)                        #/* change to stream 0          */
-  putSeed(x)                             #/* set seed[0]                 */
-  stream = s                             #/* reset the current stream    */
-  for j in range(1,STREAMS):
-    x = int(A256 * (seed[j - 1] % Q) - R * int((seed[j - 1] / Q)))
-    if (x > 0):
-      seed[j] = x
-    else:
-      seed[j] = x + MODULUS
-  
+  a = np.empty(n, dtype=np.int64)
+  x = 1
+  for i in range(n):
+    x = (MULTIPLIER * x) % MODULUS
+    a[i] = x
+  return a
 
-def putSeed(x):
-  # /* -------------------------------------------------------------------
-  #  * Use this (optional) procedure to initialize or reset the state of
-  #  * the random number generator according to the following conventions:
-  #  *    if x > 0 then x is the initial seed (unless too large)
-  #  *    if x < 0 then the initial seed is obtained from the system clock
-  #  *    if x = 0 then the initial seed is to be supplied interactively
-  #  * --------------------------------------------------------------------
+
+def jumpMultiplier(n, a=MULTIPLIER):
+  # /* ------------------------------------------------------------------
+  #  * Returns a^n mod MODULUS by modular exponentiation: multiplying a
+  #  * state by jumpMultiplier(n) advances it by n calls to Random() (by n
+  #  * stream spacings if a = A256), in O(log n) time.
+  #  * ------------------------------------------------------------------
   #  */
-  global seed 
+  return pow(a, n, MODULUS)
 
-  ok = False
 
-  if (x > 0):
-    x = x % MODULUS  
-                            # correct if x is too large  
-  if (x < 0): 
-    x = time()
-    x = x % MODULUS
-  
-  if (x == 0):
-    while (ok == False): 
-      line = input("\nEnter a positive integer seed (9 digits or less) >> ")
-      x = int(line)
-      ok = (0 < x) and (x < MODULUS)
-      if (ok == False):
-        print("\nInput out of range ... try again\n")
-    
-    
-  seed[stream] = int(x)
+class Stream:
+  # /* ------------------------------------------------------------------
+  #  * A single Lehmer stream that generates its uniforms in blocks.  The
+  #  * i-th state of a block is (MULTIPLIER^i mod MODULUS) * x mod MODULUS,
+  #  * where x is the last state of the previous block, so a whole block
+  #  * is one vectorized integer product.  The uniforms are then handed
+  #  * out one at a time from a buffer: random is the __next__ of a chain
+  #  * over the blocks (no Python frame per uniform), and the generator
+  #  * feeding the chain computes a new block only when one runs out.  For
+  #  * the same starting state the sequence is bit-identical to the one
+  #  * returned by Random().
+  #  * ------------------------------------------------------------------
+  #  */
+  _multipliers = {}
 
+  def __init__(self, x, block=BLOCK):
+    if block not in Stream._multipliers:
+      Stream._multipliers[block] = blockMultipliers(block)
+    self.block = block
+    self.states = np.array([x], dtype=np.int64)
+    self.buffer = []
+    self._block = iter(self.buffer)
+    self.random = chain.from_iterable(self._blocks()).__next__
 
-def getSeed():
-  # /* --------------------------------------------------------------------
-  #  * Use this (optional) procedure to get the current state of the random
-  #  * number generator.
-  #  * --------------------------------------------------------------------
+  def _blocks(self):
+    # /* the iterator of the current block is kept, for getSeed */
+    while True:
+      x = int(self.states[-1])
+      self.states = (Stream._multipliers[self.block] * x) % MODULUS
+      self.buffer = (self.states / MODULUS).tolist()
+      self._block = iter(self.buffer)
+      yield self._block
+
+  def getSeed(self):
+    # /* state of the stream after the last uniform handed out */
+    pos = len(self.buffer) - length_hint(self._block)
+    if pos == 0:
+      return int(self.states[-1])
+    return int(self.states[pos - 1])
+
+  def __getstate__(self):
+    # /* ------------------------------------------------------------------
+    #  * A stream is pickled as its current state only (the buffer and its
+    #  * iterator are not picklable as a pair): the restored stream starts a
+    #  * new block from that state and continues with the same sequence.
+    #  * ------------------------------------------------------------------
+    #  */
+    return {'x': self.getSeed(), 'block': self.block}
+
+  def __setstate__(self, state):
+    self.__init__(state['x'], state['block'])
+
+
+class RngStreams:
+  # /* ------------------------------------------------------------------
+  #  * The 256 streams of the library as an object: every instance owns its
+  #  * own states, so independent simulations (threads, processes) never
+  #  * share the generator.  The module-level functions below are a shim
+  #  * around a default instance and keep the original interface working.
+  #  * ------------------------------------------------------------------
   #  */
-  return seed[stream]
+  def __init__(self, x=None):
+    self.stream = 0
+    self.initialized = 0
+    self.seed = [DEFAULT] * STREAMS
+    if x is not None:
+      self.plantSeeds(x)
+
+  def random(self):
+    #/* ---------------------------------------------------------------------
+    #* Random is a Lehmer generator that returns a pseudo-random real number
+    #* uniformly distributed between 0.0 and 1.0.  The period is (m - 1)
+    #* where m = 2,147,483,647 amd the smallest and largest possible values
+    #* are (1 / m) and 1 - (1 / m) respectively.
+    #* ---------------------------------------------------------------------
+    #*/
+    x = self.seed[self.stream]
+    t = MULTIPLIER * (x % Q) - R * (x // Q)
+    if (t > 0):
+      self.seed[self.stream] = t
+    else:
+      self.seed[self.stream] = t + MODULUS
 
+    return self.seed[self.stream] / MODULUS
+
+  def plantSeeds(self, x):
+    # /* --------------------------------------------------------------------
+    #  * Use this function to set the state of all the random number generator
+    #  * streams by "planting" a sequence of states (seeds), one per stream,
+    #  * with all states dictated by the state of the default stream.
+    #  * The sequence of planted states is separated one from the next by
+    #  * 8,367,782 calls to Random().
+    #  * ---------------------------------------------------------------------
+    #  */
+    self.initialized = 1
+    s = self.stream                        #/* remember the current stream */
+    self.selectStream(0)                   #/* change to stream 0          */
+    self.putSeed(x)                        #/* set seed[0]                 */
+    self.stream = s                        #/* reset the current stream    */
+    for j in range(1,STREAMS):
+      x = A256 * (self.seed[j - 1] % Q256) - R256 * (self.seed[j - 1] // Q256)
+      if (x > 0):
+        self.seed[j] = x
+      else:
+        self.seed[j] = x + MODULUS
+
+  def putSeed(self, x):
+    # /* -------------------------------------------------------------------
+    #  * Use this (optional) procedure to initialize or reset the state of
+    #  * the random number generator according to the following conventions:
+    #  *    if x > 0 then x is the initial seed (unless too large)
+    #  *    if x < 0 then the initial seed is obtained from the system clock
+    #  *    if x = 0 then the initial seed is to be supplied interactively
+    #  * --------------------------------------------------------------------
+    #  */
+    ok = False
+
+    if (x > 0):
+      x = x % MODULUS
+                              # correct if x is too large
+    if (x < 0):
+      x = time()
+      x = x % MODULUS
+
+    if (x == 0):
+      while (ok == False):
+        line = input("\nEnter a positive integer seed (9 digits or less) >> ")
+        x = int(line)
+        ok = (0 < x) and (x < MODULUS)
+        if (ok == False):
+          print("\nInput out of range ... try again\n")
+
+    self.seed[self.stream] = int(x)
+
+  def getSeed(self):
+    # /* --------------------------------------------------------------------
+    #  * Use this (optional) procedure to get the current state of the random
+    #  * number generator.
+    #  * --------------------------------------------------------------------
+    #  */
+    return self.seed[self.stream]
+
+  def selectStream(self, index):
+    #/* ------------------------------------------------------------------
+    #* Use this function to set the current random number generator
+    #* stream -- that stream from which the next random number will come.
+    #* ------------------------------------------------------------------
+    #*/
+    self.stream = index % STREAMS
+    if (self.initialized == 0) and (self.stream != 0):   #/* protect against        */
+      self.plantSeeds(DEFAULT)                          #/* un-initialized streams */
+
+  def jump(self, index, n):
+    # /* ------------------------------------------------------------------
+    #  * Advances stream 'index' by n calls to Random() without generating
+    #  * the intermediate values.
+    #  * ------------------------------------------------------------------
+    #  */
+    index = index % STREAMS
+    self.seed[index] = (self.seed[index] * jumpMultiplier(n)) % MODULUS
+
+  def jumpStreams(self, n):
+    # /* ------------------------------------------------------------------
+    #  * Advances every stream by n times the spacing used by plantSeeds
+    #  * (A256 = MULTIPLIER^8,367,782), so that, right after plantSeeds(x),
+    #  * stream j starts where stream j + n would have started.
+    #  * ------------------------------------------------------------------
+    #  */
+    a = jumpMultiplier(n, A256)
+    for j in range(STREAMS):
+      self.seed[j] = (self.seed[j] * a) % MODULUS
+
+  def getStream(self, index):
+    # /* ------------------------------------------------------------------
+    #  * Returns a block-buffered Stream that continues stream 'index' from
+    #  * its current state.  The state held here is not advanced.
+    #  * ------------------------------------------------------------------
+    #  */
+    index = index % STREAMS
+    if (self.initialized == 0) and (index != 0):
+      self.plantSeeds(DEFAULT)
+    return Stream(self.seed[index])
+
+
+#/* ------------------------------------------------------------------------
+#* Compatibility shim: the original module-level interface, backed by a
+#* default RngStreams instance.
+#* ------------------------------------------------------------------------
+#*/
+_default = RngStreams()
+
+def random():
+  return _default.random()
+
+def plantSeeds(x):
+  _default.plantSeeds(x)
+
+def putSeed(x):
+  _default.putSeed(x)
+
+def getSeed():
+  return _default.getSeed()
 
 def selectStream(index):
-  #/* ------------------------------------------------------------------
-  #* Use this function to set the current random number generator
-  #* stream -- that stream from which the next random number will come.
-  #* ------------------------------------------------------------------
-  #*/
-  global stream 
+  _default.selectStream(index)
 
-  stream = index % STREAMS
-  if (initialized == 0) and (stream != 0):   #/* protect against        */
-    plantSeeds(DEFAULT)                     #/* un-initialized streams */
-    
+def getStream(index):
+  return _default.getStream(index)
 
 
-  
 def testRandom():
   # /* -------------------------------------------------------------------
   #  * Use this (optional) procedure to test for a correct implementation.
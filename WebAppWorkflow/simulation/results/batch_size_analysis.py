@@ -0,0 +1,34 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from src.results_io import load_run
+from src.stats import batch_size_analysis
+from src.utils import print_batch_size_analysis
+
+SCENARIO = "light_1FA"
+BATCH_K = 128
+
+RESULTS_FOLDER = os.path.join(BASE_DIR, "..", "results", "infinite")
+
+
+# Carica (mappata in memoria) la sequenza dei tempi di risposta registrata dalla
+# ricerca del batch size o, in mancanza, da una run a orizzonte infinito
+def load_rt_stream(scenario):
+    for run in ("batch_search", "infinite"):
+        path = os.path.join(RESULTS_FOLDER, f"{run}_{scenario}.npz")
+        if os.path.exists(path):
+            columns, _ = load_run(path)
+            if 'rt_stream' in columns:
+                return columns['rt_stream']
+
+    raise FileNotFoundError(f"Nessuna sequenza dei tempi di risposta per lo scenario {scenario} in {RESULTS_FOLDER}")
+
+
+if __name__ == "__main__":
+    # Scelta di b a posteriori: batch means per ogni b potenza di 2
+    rts = load_rt_stream(SCENARIO)
+    print(f"Scenario {SCENARIO}: {len(rts)} tempi di risposta")
+    print_batch_size_analysis(batch_size_analysis(rts, BATCH_K), BATCH_K)
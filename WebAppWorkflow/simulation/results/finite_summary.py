@@ -0,0 +1,35 @@
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from src.results_io import load_run, finite_metric
+from src.stats import replication_summary
+from src.utils import print_replication_summary
+
+SCENARIO = "light_1FA"
+METRICS = ("RT", "N_system")
+
+RESULTS_FOLDER = os.path.join(BASE_DIR, "..", "results", "finite")
+
+
+# Carica (mappata in memoria) la run a orizzonte finito salvata per lo scenario
+def load_finite_run(scenario):
+    path = os.path.join(RESULTS_FOLDER, f"finite_{scenario}.npz")
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File non trovato: {path}")
+
+    return load_run(path)
+
+
+if __name__ == "__main__":
+    # Intervalli di confidenza per ogni tempo di campionamento, dalle repliche salvate
+    columns, metadata = load_finite_run(SCENARIO)
+    print(f"Scenario {SCENARIO}: {metadata['num_repetitions']} repliche, "
+          f"{metadata['stop_time']} s, campioni ogni {metadata['ts_step']} s")
+
+    for metric_name in METRICS:
+        summary = replication_summary(finite_metric(columns, metadata, metric_name))
+        print_replication_summary(metric_name, summary, metadata['ts_step'])
@@ -1,4 +1,6 @@
 import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -10,19 +12,22 @@ SCENARIO_HEAVY_NEW_B = "heavy_1FA_newServerB"
 TS_STEP = 300
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from src.results_io import load_run, finite_metric
+
 RESULTS_FOLDER = os.path.join(BASE_DIR, "..", "results", "finite")
 
+# Metrica dalla run salvata in finite_<scenario>.npz (array mappato in memoria),
+# mediata tra le repliche per ogni tempo di campionamento
 def load_metric(metric_name, scenario):
-    filename = f"{metric_name}_{scenario}.dat"
-    path = os.path.join(RESULTS_FOLDER, filename)
+    path = os.path.join(RESULTS_FOLDER, f"finite_{scenario}.npz")
 
     if not os.path.exists(path):
         raise FileNotFoundError(f"File non trovato: {path}")
 
-    with open(path, "r") as f:
-        values = [float(line.strip()) for line in f.readlines()]
-
-    return np.array(values)
+    columns, metadata = load_run(path)
+    return np.mean(finite_metric(columns, metadata, metric_name), axis=0)
 
 def plot_system_response_time(scenario):
     # --- Carica RT globale ---
@@ -1,4 +1,6 @@
 import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -10,19 +12,22 @@ BATCH_STEP = 4      # tick asse x
 QOS = 30            # soglia QoS per RT
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from src.results_io import load_run
+
 RESULTS_FOLDER = os.path.join(BASE_DIR, "..", "results", "infinite")
 
+# Metrica (un valore per batch) dalla run salvata in infinite_<scenario>.npz,
+# mappata in memoria
 def load_metric(metric_name, scenario):
-    filename = f"{metric_name}_{scenario}.dat"
-    path = os.path.join(RESULTS_FOLDER, filename)
+    path = os.path.join(RESULTS_FOLDER, f"infinite_{scenario}.npz")
 
     if not os.path.exists(path):
         raise FileNotFoundError(f"File non trovato: {path}")
 
-    with open(path, "r") as f:
-        values = [float(line.strip()) for line in f.readlines()]
-
-    return np.array(values)
+    columns, _ = load_run(path)
+    return columns[metric_name]
 
 def plot_system_response_time(scenario, ci_minus=None, ci_plus=None):
     rt_system = load_metric("RT", scenario)
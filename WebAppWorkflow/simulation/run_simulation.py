@@ -2,14 +2,20 @@ import sys
 import time
 
 from sim_config import SCENARIO, SIM_TIME, NUM_REPETITIONS, BATCH_K, SEARCH_BATCH_SIZE, BATCH_B, B_VALUES, ARRIVAL_RATE, \
-    SEARCH_THR_BOUND
+    SEARCH_THR_BOUND, NUM_WORKERS, ADAPTIVE_BATCHES, RT_PRECISION, MIN_BATCHES, MAX_BATCHES, ADAPTIVE_REPETITIONS, \
+    REPETITION_PRECISION, MIN_REPETITIONS, COMPARE_SCENARIOS, COMPARISON_REPETITIONS
 from src.simulator import finite_horizon_simulation, infinite_horizon_simulation, find_batch_b, \
-    compute_throughput_vs_lambda
+    compute_throughput_vs_lambda, compare_scenarios
 from src.utils import print_line, close_simulation
 
 
 def run_finite_horizon():
     print("\n[INFO] Avviata simulazione a orizzonte FINITO...\n")
+
+    if COMPARE_SCENARIOS:
+        run_scenario_comparison()
+        return
+
     scenario = SCENARIO
     sim_time = SIM_TIME
     num_repetitions = NUM_REPETITIONS
@@ -18,10 +24,33 @@ def run_finite_horizon():
     print(f"\n\n==== Finite-Horizon Simulation ===="
           f"\n*  Scenario:        {scenario}"
           f"\n*  Simulation time: {sim_time}"
-          f"\n*  Repetitions:     {num_repetitions}")
+          f"\n*  Repetitions:     {num_repetitions}"
+          f"\n*  Workers:         {NUM_WORKERS}")
+    if ADAPTIVE_REPETITIONS:
+        print(f"*  Precisione relativa RT e N_system: {REPETITION_PRECISION:.1%} "
+              f"(repliche {MIN_REPETITIONS}-{num_repetitions})")
     print_line()
 
-    finite_horizon_simulation(sim_time, num_repetitions)
+    if ADAPTIVE_REPETITIONS:
+        finite_horizon_simulation(sim_time, num_repetitions, precision=REPETITION_PRECISION,
+                                  min_repetitions=MIN_REPETITIONS)
+    else:
+        finite_horizon_simulation(sim_time, num_repetitions)
+
+    close_simulation()
+
+def run_scenario_comparison():
+    scenario_a, scenario_b = COMPARE_SCENARIOS
+
+    time.sleep(1)
+    print(f"\n\n==== Confronto tra scenari (numeri casuali comuni) ===="
+          f"\n*  Scenari:         {scenario_a} → {scenario_b}"
+          f"\n*  Simulation time: {SIM_TIME}"
+          f"\n*  Repetitions:     {COMPARISON_REPETITIONS}"
+          f"\n*  Workers:         {NUM_WORKERS}")
+    print_line()
+
+    compare_scenarios(scenario_a, scenario_b, SIM_TIME, COMPARISON_REPETITIONS)
 
     close_simulation()
 
@@ -42,6 +71,8 @@ def run_infinite_horizon():
             scenario = "1FA"
         elif SCENARIO == "light_2FA":
             scenario = "2FA"
+        elif SCENARIO == "heavy_1FA_twoCoresB":
+            scenario = "1FA 2 Core B"
         else:
             scenario = "1FA New B"
         print(f"\n\n==== Ricerca del Throughput Bound ===="
@@ -49,6 +80,16 @@ def run_infinite_horizon():
         print_line()
 
         compute_throughput_vs_lambda(scenario)
+    elif ADAPTIVE_BATCHES:
+        print(f"\n\n==== Infinite-Horizon Simulation (arresto sequenziale) ===="
+              f"\n*  Scenario: {SCENARIO}"
+              f"\n*  # Batch: {MIN_BATCHES}-{MAX_BATCHES}"
+              f"\n*  Batch size: {BATCH_B}"
+              f"\n*  Precisione relativa RT: {RT_PRECISION:.1%}")
+        print_line()
+
+        infinite_horizon_simulation(MAX_BATCHES, BATCH_B, ARRIVAL_RATE, precision=RT_PRECISION,
+                                    min_batches=MIN_BATCHES)
     else:
         print(f"\n\n==== Infinite-Horizon Simulation ===="
               f"\n*  Scenario: {SCENARIO}"
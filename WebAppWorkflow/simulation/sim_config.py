@@ -1,3 +1,5 @@
+import os
+
 # ============================================================
 #   CONFIGURAZIONE GENERALE DEL MODELLO
 # ============================================================
@@ -7,11 +9,18 @@
 # 2)  "light_2FA"
 # 3)  "heavy_1FA"
 # 4)  "heavy_1FA_newServerB"
+# 5)  "heavy_1FA_twoCoresB"
 SCENARIO = "light_1FA"
 
 # Imposta a 'True' per visualizzare le visite ai server
 PLOT_VISITS = False
 
+# Tracciamento delle visite ai server:
+# - "off":        solo RT globale e throughput
+# - "aggregates": anche RT e service demand per server
+# - "full":       anche la history delle visite (necessaria per PLOT_VISITS)
+TRACE_LEVEL = "full" if PLOT_VISITS else "aggregates"
+
 # Imposta a 'True' per la ricerca del batch size ottimale
 SEARCH_BATCH_SIZE = False
 
@@ -32,6 +41,28 @@ SERVICE_STREAMS = {
     'P': 3,
 }
 
+# Stream delle diramazioni probabilistiche del routing (usato solo se presenti)
+ROUTING_STREAM = 4
+
+# Numero di processi per le esecuzioni in parallelo (1 = sequenziale)
+NUM_WORKERS = os.cpu_count() or 1
+
+# I risultati di ogni run sono salvati in un unico file .npz (results/<orizzonte>/);
+# imposta a 'True' per esportarli anche nei file .dat testuali (un valore per riga)
+EXPORT_TEXT = False
+
+# Cache dei risultati (results/cache/): una run con la stessa configurazione
+# effettiva (scenario, seme, λ, service demands, b/k o durata e repliche, ...)
+# riusa il file salvato invece di ripetere la simulazione. Oltre RESULT_CACHE_MAX_MB
+# vengono eliminate le voci usate meno di recente
+RESULT_CACHE = True
+RESULT_CACHE_MAX_MB = 512
+
+# Imposta a 'True' per salvare lo stato della simulazione a orizzonte infinito dopo
+# ogni batch (results/checkpoints/): una run interrotta riparte dall'ultimo batch
+# completato, con gli stessi risultati di una run senza interruzioni
+CHECKPOINT_BATCHES = True
+
 # Per la simulazione a orizzonte finito
 if PLOT_VISITS:
     SIM_TIME = 12  # secondi
@@ -42,10 +73,54 @@ else:
 
 TS_STEP = 300  # time-slot (in secondi)
 
+# Arresto sequenziale delle repliche: con 'True' si aggiungono repliche a blocchi di
+# REPETITION_CHUNK (almeno MIN_REPETITIONS, al più NUM_REPETITIONS) finché, in ogni
+# time-slot, la semi-ampiezza dell'intervallo di confidenza al 95% di RT e N_system
+# non scende sotto REPETITION_PRECISION · media
+ADAPTIVE_REPETITIONS = False
+REPETITION_PRECISION = 0.05
+MIN_REPETITIONS = 16
+REPETITION_CHUNK = 16
+
+# Confronto accoppiato tra due scenari (numeri casuali comuni): con una coppia di
+# scenari, es. ("light_1FA", "light_2FA"), la simulazione a orizzonte finito esegue
+# COMPARISON_REPETITIONS repliche di entrambi sugli stessi stream (arrivi e servizio
+# di ogni server) e riporta l'intervallo di confidenza delle differenze
+COMPARE_SCENARIOS = None
+COMPARISON_REPETITIONS = 32
+
 
 # Parametri Batch Means (per la simulazione a orizzonte infinito)
 BATCH_K = 128
 
+# Arresto sequenziale: con 'True' i batch proseguono (almeno MIN_BATCHES, al più
+# MAX_BATCHES) finché la semi-ampiezza dell'intervallo di confidenza al 95% sulla
+# media dei tempi di risposta dei batch non scende sotto RT_PRECISION · media.
+# Ogni stream ha ~8.4 milioni di estrazioni prima dell'inizio dello stream successivo
+# (meno con più di 256 stream in uso, vedi replication_streams) e il server A ne usa
+# ~3 per job: MAX_BATCHES · BATCH_B oltre ~2.8 milioni di job (es. 1024 x 32768)
+# sovrappone le sequenze, e la simulazione lo segnala con un avviso
+ADAPTIVE_BATCHES = False
+RT_PRECISION = 0.05
+MIN_BATCHES = 32
+MAX_BATCHES = 1024
+
+# Variabili di controllo per le stime di RT e N_system dei batch, fissate prima della
+# run: "Interarrival" (interarrivo medio del batch, di media nota 1 / λ) e/o "D_<server>"
+# (service demand medio dei job completati nel batch). Sotto carico i job completati
+# in un batch non sono un campione rappresentativo (i job con demand maggiore restano
+# più spesso in volo), quindi la media dei D_<server> si discosta da quella nota:
+# usarli solo con carichi leggeri
+CONTROL_VARIATES = ("Interarrival",)
+
+# Imposta a 'True' per registrare la sequenza dei tempi di risposta della run
+# (per scegliere b a posteriori, senza nuove simulazioni)
+RECORD_RT_STREAM = False
+
+# Imposta a 'True' per ricavare i batch di tutti i b da un'unica run
+# (altrimenti una run per ogni b, distribuite sui worker)
+BATCH_SEARCH_SINGLE_RUN = True
+
 if SEARCH_BATCH_SIZE:
     SEED = 987654321
     B_VALUES = (4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
@@ -60,6 +135,9 @@ else:
         BATCH_B = 1024
     elif SCENARIO == "heavy_1FA_newServerB":
         BATCH_B = 32768
+    elif SCENARIO == "heavy_1FA_twoCoresB":
+        # dalla ricerca di b (k = 128): lag-1 0.095 con b = 32768, 0.337 con 16384
+        BATCH_B = 32768
     else:
         BATCH_B = None
 
@@ -69,6 +147,9 @@ else:
 #   SERVICE DEMANDS BASE (scenario: LIGHT, 1 FACTOR)
 # ============================================================
 
+# I server della rete sono i nodi di questa tabella: per un nuovo tier basta
+# aggiungerne i service demands, lo stream (SERVICE_STREAMS), core e velocità
+# (BASE_SERVER_CORES / BASE_SERVER_SPEEDS) e le sue voci in ROUTING
 BASE_SERVICE_DEMANDS = {
     'A': {   # 3 visite: Class1, Class2, Class3
         'Class1': 0.2,
@@ -84,6 +165,26 @@ BASE_SERVICE_DEMANDS = {
 }
 
 
+# ============================================================
+#   ROUTING
+# ============================================================
+
+# Nodo e classe dei job in arrivo al sistema
+ENTRY_ROUTE = ('A', 'Class1')
+
+# (nodo, classe) all'uscita dal nodo → [(probabilità, nodo successivo, classe successiva)].
+# Il class switch è una destinazione con una classe diversa, 'SINK' l'uscita dal
+# sistema; le coppie non elencate escono dal sistema. Con più destinazioni la scelta
+# usa ROUTING_STREAM, es. [(0.9, 'P', 'Class2'), (0.1, 'SINK', None)]
+ROUTING = {
+    ('A', 'Class1'): [(1.0, 'B', 'Class1')],
+    ('B', 'Class1'): [(1.0, 'A', 'Class2')],   # class switch
+    ('A', 'Class2'): [(1.0, 'P', 'Class2')],
+    ('P', 'Class2'): [(1.0, 'A', 'Class3')],   # class switch
+    ('A', 'Class3'): [(1.0, 'SINK', None)],
+}
+
+
 # ============================================================
 #   MODIFICHE PER AUTENTICAZIONE A 2 FATTORI (2FA / SCA)
 # ============================================================
@@ -95,11 +196,19 @@ SCA_MODIFICATIONS = {
 
 
 # ============================================================
-#   SCALING SERVER B (nuovo server B = 2× più veloce)
+#   CAPACITÀ DEI SERVER E SCALING SERVER B
 # ============================================================
-NEW_SERVER_B = {
-    ('B', 'Class1'): 0.4
-}
+
+# Numero di core e velocità di ogni core (1.0 = server attuale): i service demands
+# restano quelli del carico di lavoro e un core a velocità s li serve in D / s
+BASE_SERVER_CORES = {'A': 1, 'B': 1, 'P': 1}
+BASE_SERVER_SPEEDS = {'A': 1.0, 'B': 1.0, 'P': 1.0}
+
+# Scaling verticale: nuovo server B 2× più veloce
+NEW_SERVER_B_SPEED = 2.0
+
+# Scaling orizzontale: server B con 2 core della velocità attuale
+TWO_CORES_B = 2
 
 
 # ============================================================
@@ -116,37 +225,53 @@ ARRIVAL_RATES = {
 #   COSTRUZIONE DELLO SCENARIO
 # ============================================================
 
-# Copia dei service demands base
 import copy
-SERVICE_DEMANDS = copy.deepcopy(BASE_SERVICE_DEMANDS)
 
-# ------------------------------------------------------------
-# 1) LIGHT WORKLOAD, 1 FACTOR
-# ------------------------------------------------------------
-if SCENARIO == "light_1FA":
-    ARRIVAL_RATE = ARRIVAL_RATES["light"]
+# Parametri di uno scenario: (tasso di arrivo, service demands, core e velocità dei
+# server), ottenuti modificando una copia dei valori base
+def scenario_parameters(name):
+    service_demands = copy.deepcopy(BASE_SERVICE_DEMANDS)
+    server_cores = dict(BASE_SERVER_CORES)
+    server_speeds = dict(BASE_SERVER_SPEEDS)
+
+    # ------------------------------------------------------------
+    # 1) LIGHT WORKLOAD, 1 FACTOR
+    # ------------------------------------------------------------
+    if name == "light_1FA":
+        arrival_rate = ARRIVAL_RATES["light"]
+
+    # ------------------------------------------------------------
+    # 2) LIGHT WORKLOAD + AUTENTICAZIONE A 2 FATTORI
+    # ------------------------------------------------------------
+    elif name == "light_2FA":
+        arrival_rate = ARRIVAL_RATES["light"]
+        for (node, cls), value in SCA_MODIFICATIONS.items():
+            service_demands[node][cls] = value
+
+    # ------------------------------------------------------------
+    # 3) HEAVY WORKLOAD (stessi tempi di servizio)
+    # ------------------------------------------------------------
+    elif name == "heavy_1FA":
+        arrival_rate = ARRIVAL_RATES["heavy"]
+
+    # ------------------------------------------------------------
+    # 4) HEAVY WORKLOAD + NUOVO SERVER B (2× più veloce)
+    # ------------------------------------------------------------
+    elif name == "heavy_1FA_newServerB":
+        arrival_rate = ARRIVAL_RATES["heavy"]
+        server_speeds['B'] = NEW_SERVER_B_SPEED
+
+    # ------------------------------------------------------------
+    # 5) HEAVY WORKLOAD + SERVER B A 2 CORE
+    # ------------------------------------------------------------
+    elif name == "heavy_1FA_twoCoresB":
+        arrival_rate = ARRIVAL_RATES["heavy"]
+        server_cores['B'] = TWO_CORES_B
 
-# ------------------------------------------------------------
-# 2) LIGHT WORKLOAD + AUTENTICAZIONE A 2 FATTORI
-# ------------------------------------------------------------
-elif SCENARIO == "light_2FA":
-    ARRIVAL_RATE = ARRIVAL_RATES["light"]
-    for (node, cls), value in SCA_MODIFICATIONS.items():
-        SERVICE_DEMANDS[node][cls] = value
+    else:
+        raise ValueError(f"Scenario sconosciuto: {name}")
 
-# ------------------------------------------------------------
-# 3) HEAVY WORKLOAD (stessi tempi di servizio)
-# ------------------------------------------------------------
-elif SCENARIO == "heavy_1FA":
-    ARRIVAL_RATE = ARRIVAL_RATES["heavy"]
+    return arrival_rate, service_demands, server_cores, server_speeds
 
-# ------------------------------------------------------------
-# 4) HEAVY WORKLOAD + NUOVO SERVER B (2× più veloce)
-# ------------------------------------------------------------
-elif SCENARIO == "heavy_1FA_newServerB":
-    ARRIVAL_RATE = ARRIVAL_RATES["heavy"]
-    for (node, cls), value in NEW_SERVER_B.items():
-        SERVICE_DEMANDS[node][cls] = value
 
-else:
-    raise ValueError(f"Scenario sconosciuto: {SCENARIO}")
+ARRIVAL_RATE, SERVICE_DEMANDS, SERVER_CORES, SERVER_SPEEDS = scenario_parameters(SCENARIO)
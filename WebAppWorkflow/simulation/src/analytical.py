@@ -0,0 +1,181 @@
+from math import isfinite
+
+import numpy as np
+
+from src.stats import student_t_interval, CONFIDENCE
+
+
+# -------------------------------------------------------
+#      Soluzione analitica della rete (BCMP, aperta)
+# -------------------------------------------------------
+# La rete A/B/P con nodi PS, arrivi di Poisson e class switch è in forma prodotto:
+# ogni nodo si comporta come una coda isolata con il suo carico λ · D_i, per cui le
+# metriche in stato stazionario si ottengono in forma chiusa (come nel foglio
+# analytical/analytical_solution.xlsx). Tempi in secondi, λ in richieste al secondo.
+
+# Ingresso e = (server, classe) dei job in arrivo e probabilità di passaggio P tra
+# le coppie (server, classe) della tabella di routing compilata (RoutingTable), con
+# la coppia (i, c) all'indice i · numero di classi + c
+def routing_matrices(routing):
+    n_classes = len(routing.class_names)
+    n = len(routing.server_names) * n_classes
+
+    entry = np.zeros(n)
+    entry_node, entry_class, _ = routing.entry
+    entry[routing.server_index[entry_node] * n_classes + entry_class] = 1.0
+
+    transitions = np.zeros((n, n))
+    for i, per_class in enumerate(routing.routes):
+        for c, branches in enumerate(per_class):
+            prev_p = 0.0
+            for cum_p, next_node, next_class, _ in branches:
+                if next_node is not None:
+                    j = routing.server_index[next_node] * n_classes + next_class
+                    transitions[i * n_classes + c, j] += cum_p - prev_p
+                prev_p = cum_p
+
+    return entry, transitions
+
+# Flussi x in ingresso alle coppie (server, classe): soluzione di x = e + Pᵀ (θ ∘ x),
+# dove θ è la frazione del flusso entrante servita da ogni coppia (1: tutto)
+def _solve_flows(entry, transitions, theta):
+    try:
+        return np.linalg.solve(np.eye(len(entry)) - transitions.T * theta, entry)
+    except np.linalg.LinAlgError:
+        raise ValueError("routing senza uscita dal sistema (rete chiusa)") from None
+
+# Visite medie per (server, classe) di una richiesta: soluzione delle equazioni di
+# traffico v = e + v · P, con e l'ingresso della richiesta e P le probabilità di
+# passaggio tra (nodo, classe)
+def visit_counts(routing):
+    entry, transitions = routing_matrices(routing)
+    visits = _solve_flows(entry, transitions, np.ones(len(entry)))
+    return visits.reshape(len(routing.server_names), len(routing.class_names))
+
+# Service demand totale D_i di ogni server per richiesta: somma sulle classi di
+# visite medie · service demand della singola visita
+def node_demands(routing, service_demands, visits=None):
+    if visits is None:
+        visits = visit_counts(routing)
+    class_index = {name: c for c, name in enumerate(routing.class_names)}
+
+    return {node: float(sum(visits[routing.server_index[node], class_index[job_class]] * demand
+                            for job_class, demand in service_demands.get(node, {}).items()
+                            if job_class in class_index))
+            for node in routing.server_names}
+
+# Probabilità di attesa di Erlang-C di una M/M/c con carico offerto a = λ · D (< c)
+def erlang_c(c, a):
+    term = 1.0
+    partial_sum = 1.0
+    for k in range(1, c):
+        term *= a / k
+        partial_sum += term
+    top = term * (a / c) / (1.0 - a / c)     # a^c / c! · 1 / (1 - ρ)
+    return top / (partial_sum + top)
+
+# Throughput bound: 1 / max_i D_i / (core_i · velocità_i), il collo di bottiglia
+def throughput_bound(demands, cores, speeds):
+    d_max = max(demands[node] / (cores[node] * speeds[node]) for node in demands)
+    return 1.0 / d_max if d_max > 0 else float('inf')
+
+# Service demand della singola visita per (server, classe), nulli per le coppie
+# senza service demand (mai visitate)
+def visit_demands(routing, service_demands):
+    return np.array([[service_demands.get(node, {}).get(job_class, 0.0) for job_class in routing.class_names]
+                     for node in routing.server_names])
+
+# Flussi (richieste al secondo) in ingresso a ogni (server, classe) con tasso di
+# arrivo arrival_rate, e frazione θ del flusso servita da ogni server. Un server
+# il cui carico supera i core è saturo: ne esce al più la sua capacità, cioè la
+# frazione θ = core / carico del flusso entrante (la stessa per tutte le classi,
+# che in PS condividono il server), e i server a valle ricevono solo quella. I θ
+# si ricavano per punto fisso, a partire da nessun server saturo
+def saturated_flows(arrival_rate, routing, service_demands, cores, speeds, max_iterations=100):
+    entry, transitions = routing_matrices(routing)
+    n_servers, n_classes = len(routing.server_names), len(routing.class_names)
+    work = (visit_demands(routing, service_demands) /
+            np.array([[speeds[node]] for node in routing.server_names]))
+    capacity = np.array([cores[node] for node in routing.server_names], dtype=float)
+
+    theta = np.ones(n_servers)
+    for _ in range(max_iterations):
+        flows = arrival_rate * _solve_flows(entry, transitions, np.repeat(theta, n_classes))
+        load = (flows.reshape(n_servers, n_classes) * work).sum(axis=1)
+        with np.errstate(divide='ignore'):
+            new_theta = np.where(load > capacity, capacity / load, 1.0)
+        if np.allclose(new_theta, theta, rtol=0.0, atol=1e-12):
+            break
+        theta = new_theta
+
+    return flows.reshape(n_servers, n_classes), theta
+
+# Metriche in stato stazionario con tasso di arrivo arrival_rate, con gli stessi nomi
+# di compute_metrics_infinite. Un nodo PS con c core a velocità s ha la distribuzione
+# del numero di job di una M/M/c con carico a (flusso servito · D / s):
+#   U = a / c,  N = a + C(c, a) · U / (1 - U)
+# e, poiché in PS il tempo di ogni visita è proporzionale al suo service demand,
+# R = D / s · N / a per richiesta (N / λ per Little sotto il throughput bound).
+# Oltre il bound i server saturi hanno U = 1 e N, R infiniti (quindi anche RT e
+# N_system), il throughput è quello d'uscita dei server saturi e i server a valle
+# ne ricevono solo il flusso servito
+def solve_open(arrival_rate, routing, service_demands, cores, speeds):
+    visits = visit_counts(routing)
+    demands = node_demands(routing, service_demands, visits)
+    thr_max = throughput_bound(demands, cores, speeds)
+
+    flows, theta = saturated_flows(arrival_rate, routing, service_demands, cores, speeds)
+    _, transitions = routing_matrices(routing)
+    served = flows * theta[:, None]
+    exit_p = 1.0 - transitions.sum(axis=1)
+    work = visit_demands(routing, service_demands)
+
+    metrics = {'RT': 0.0, 'Throughput': float((served.ravel() * exit_p).sum())}
+    n_system = 0.0
+    for node in routing.server_names:
+        i = routing.server_index[node]
+        c = cores[node]
+        a = float((served[i] * work[i]).sum()) / speeds[node]
+        utilization = min(a / c, 1.0)
+
+        if theta[i] < 1.0 or utilization >= 1.0:
+            n_node = rt_node = float('inf')
+        elif a > 0:
+            n_node = a + erlang_c(c, a) * utilization / (1.0 - utilization)
+            rt_node = demands[node] / speeds[node] * n_node / a
+        else:
+            n_node = 0.0
+            rt_node = demands[node] / speeds[node]
+
+        metrics[f'N_{node}'] = n_node
+        metrics[f'U_{node}'] = utilization
+        metrics[f'Throughput_{node}'] = float(served[i].sum())
+        metrics[f'RT_{node}'] = rt_node
+        metrics[f'D_{node}'] = demands[node]
+        metrics['RT'] += rt_node
+        n_system += n_node
+
+    metrics['N_system'] = n_system
+    metrics['Throughput_bound'] = thr_max
+
+    return metrics
+
+# Confronto dei batch di una run a orizzonte infinito con la soluzione analitica:
+# per ogni metrica presente in entrambi, media e semi-ampiezza dell'intervallo di
+# confidenza dei batch, valore atteso, errore relativo e copertura dell'intervallo.
+# Le metriche senza valore stazionario (infinite oltre il throughput bound) sono omesse
+def validate_batches(batch_stats, solution, confidence=CONFIDENCE):
+    rows = []
+    for name, expected in solution.items():
+        if name not in batch_stats[0] or not isfinite(expected):
+            continue
+        mean, half_width = student_t_interval([m[name] for m in batch_stats], confidence)
+        rows.append({
+            'metric': name,
+            'mean': mean,
+            'half_width': half_width,
+            'expected': expected,
+            'relative_error': abs(mean - expected) / abs(expected) if expected else abs(mean),
+            'covered': abs(mean - expected) <= half_width,
+        })
+    return rows
@@ -0,0 +1,51 @@
+import os
+import pickle
+from array import array
+
+from src.result_cache import config_hash
+
+CHECKPOINT_FOLDER = "results/checkpoints/"
+
+# Dimensione in byte di un tempo di risposta nel file .rts
+RT_SIZE = array('d').itemsize
+
+
+# Percorso del checkpoint di una run: uno per configurazione (stessa chiave della cache)
+def checkpoint_path(metadata, folder=CHECKPOINT_FOLDER):
+    return os.path.join(folder, f"{config_hash(metadata)}.pkl")
+
+# Salva lo stato in modo atomico (file temporaneo poi rinominato): un'interruzione
+# durante la scrittura lascia integro il checkpoint precedente
+def save_checkpoint(path, state):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+# I tempi di risposta registrati crescono con la run: invece di riscriverli in ogni
+# checkpoint, quelli di ogni batch sono accodati a un file binario a parte (<path>.rts)
+def append_checkpoint_rts(path, rts):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".rts", "ab") as f:
+        rts.tofile(f)
+
+# Primi n tempi di risposta del file .rts; il file viene troncato a n valori, scartando
+# quelli di un batch accodati dopo l'ultimo checkpoint salvato
+def load_checkpoint_rts(path, n):
+    rts = array('d')
+    with open(path + ".rts", "r+b") as f:
+        rts.fromfile(f, n)
+        f.truncate(n * RT_SIZE)
+    return rts
+
+def remove_checkpoint(path):
+    for p in (path, path + ".rts"):
+        if os.path.exists(p):
+            os.remove(p)
@@ -1,11 +1,25 @@
+import heapq
+from array import array
+
+import numpy as np
+
+
 # -------------------------------------------------------
 #               Simulation Time
 # -------------------------------------------------------
 class Clock:
+    # Il clock di una run numera anche i suoi job: ogni simulazione ha il proprio
+    # contatore, quindi run concorrenti (es. thread) non ne condividono gli id
     def __init__(self, t0=0.0):
         self.current = t0
         self.arrival = None
         self.next = None
+        self.jobs = 0
+
+    def new_job_id(self):
+        job_id = self.jobs
+        self.jobs += 1
+        return job_id
 
     def update_current(self, t):
         self.current = t
@@ -17,49 +31,165 @@ class Clock:
         self.next = t
 
 # -------------------------------------------------------
-#               Job and Completion Event Definitions
+#               Event Calendar
 # -------------------------------------------------------
-class CompletionEvent:
-    __slots__ = ("time", "payload")
+class EventCalendar:
+    # Un solo slot "prossimo completamento" per ciascun server (l'arrivo
+    # successivo è nel Clock): riprogrammare un server sovrascrive il suo slot,
+    # per cui non vengono mai creati eventi obsoleti da scartare.
+    def __init__(self, names):
+        self.completions = dict.fromkeys(names)
+        self.scheduled = 0     # completamenti programmati
+        self.superseded = 0    # completamenti sovrascritti prima di scattare
+
+    def schedule(self, name, t):
+        if self.completions[name] is not None:
+            self.superseded += 1
+        if t is not None:
+            self.scheduled += 1
+        self.completions[name] = t
+
+    def peek(self):
+        # (tempo, server) del prossimo completamento, (None, None) se nessuno
+        best_t, best_name = None, None
+        for name, t in self.completions.items():
+            if t is not None and (best_t is None or t < best_t):
+                best_t, best_name = t, name
+        return best_t, best_name
+
+    def pop(self):
+        t, name = self.peek()
+        self.completions[name] = None
+        return t, name
 
-    def __init__(self, time, payload):
-        self.time = time
-        self.payload = payload
 
-    def __lt__(self, other):
-        return self.time < other.time
+# -------------------------------------------------------
+#               Job Definition
+# -------------------------------------------------------
+# Livelli di tracciamento delle visite ai server:
+# - off:        solo nascita e fine del job (RT globale e throughput)
+# - aggregates: anche tempo trascorso e servizio richiesto per server
+# - full:       anche la history di tutte le visite (per il plot delle visite)
+TRACE_OFF, TRACE_AGGREGATES, TRACE_FULL = 0, 1, 2
+TRACE_LEVELS = {'off': TRACE_OFF, 'aggregates': TRACE_AGGREGATES, 'full': TRACE_FULL}
 
-    def __repr__(self):
-        return f"CompletionEvent(time={self.time}, payload={self.payload})"
 
 class Job:
-    _id = 0
-    def __init__(self, t_arrival):
-        self.id = Job._id; Job._id += 1
+    # Campi per server in un unico array('d') di 2 · n_servers elementi: il server
+    # di indice i nella tabella di routing compilata (server_index) ha il servizio
+    # richiesto in 2i e il tempo trascorso in 2i + 1. La history delle visite si
+    # crea alla prima visita e solo con TRACE_FULL; current_class è l'indice della
+    # classe nella stessa tabella
+    __slots__ = ("id", "birth", "current_class", "history", "finish_tag", "server", "finish",
+                 "visit_start", "server_stats")
+
+    def __init__(self, t_arrival, job_class=0, job_id=0, n_servers=0):
+        self.id = job_id
         self.birth = t_arrival
-        self.current_class = 'Class1'
-        self.history = []
-        self.remaining = None
+        self.current_class = job_class
+        self.history = None
+        self.finish_tag = None
         self.server = None
         self.finish = None
-        self.server_times = {}
-        self.visit_count = {}
-        self.requested_service = {}
+        self.visit_start = None
+        self.server_stats = array('d', [0.0]) * (2 * n_servers)
+
+
+# -------------------------------------------------------
+#               Completed Jobs (struct-of-arrays)
+# -------------------------------------------------------
+class CompletedJobs:
+    # Job arrivati al SINK. A ogni completamento aggiorna somme correnti (tempo
+    # di risposta e, se track_servers, tempo trascorso e servizio richiesto per
+    # server), da cui le medie si leggono in O(server). Solo se richiesto copia
+    # inoltre il job in colonne array('d') (keep_columns, leggibili come array
+    # NumPy senza copie) o ne conserva l'oggetto (keep_jobs, es. per il plot
+    # delle visite); altrimenti il Job viene rilasciato. Se si passa rt_stream
+    # (array('d')), vi accoda il tempo di risposta di ogni job completato.
+    # server_names: server della rete, nell'ordine dei campi per server dei job
+    def __init__(self, server_names, track_servers=True, keep_columns=True, keep_jobs=False, rt_stream=None):
+        self.server_index = {name: i for i, name in enumerate(server_names)}
+        self.count = 0
+        self.sum_rt = 0.0
+        self.track_servers = track_servers
+        self.sum_server_times = [0.0] * len(server_names)
+        self.sum_requested_service = [0.0] * len(server_names)
+
+        self.keep_columns = keep_columns
+        self.birth = array('d')
+        self.finish = array('d')
+        self.server_times = [array('d') for _ in server_names]
+        self.requested_service = [array('d') for _ in server_names]
+        self.jobs = [] if keep_jobs else None
+        self.rt_stream = rt_stream
+
+    def __len__(self):
+        return self.count
+
+    def append(self, job):
+        rt = job.finish - job.birth
+        self.count += 1
+        self.sum_rt += rt
+        if self.rt_stream is not None:
+            self.rt_stream.append(rt)
+        if self.track_servers:
+            stats = job.server_stats
+            for i in range(len(self.server_index)):
+                self.sum_requested_service[i] += stats[2 * i]
+                self.sum_server_times[i] += stats[2 * i + 1]
+
+        if self.keep_columns:
+            self.birth.append(job.birth)
+            self.finish.append(job.finish)
+            if self.track_servers:
+                for i in range(len(self.server_index)):
+                    self.requested_service[i].append(stats[2 * i])
+                    self.server_times[i].append(stats[2 * i + 1])
+        if self.jobs is not None:
+            self.jobs.append(job)
+
+    def mean_response_time(self):
+        return self.sum_rt / self.count if self.count else 0.0
+
+    def mean_server_time(self, sname):
+        return self.sum_server_times[self.server_index[sname]] / self.count if self.count else 0.0
+
+    def mean_requested_service(self, sname):
+        return self.sum_requested_service[self.server_index[sname]] / self.count if self.count else 0.0
+
+    def response_times(self):
+        return np.frombuffer(self.finish) - np.frombuffer(self.birth)
+
+    def server_time_column(self, sname):
+        return np.frombuffer(self.server_times[self.server_index[sname]])
+
+    def requested_service_column(self, sname):
+        return np.frombuffer(self.requested_service[self.server_index[sname]])
 
 
 # -------------------------------------------------------
 #                   Processor-Sharing Node
 # -------------------------------------------------------
 class PSServer:
-    def __init__(self, name):
+    # Il server mantiene un orologio virtuale (vtime) pari al servizio ricevuto
+    # da ciascun job presente: con n job, cores core e velocità speed ogni job
+    # riceve servizio al tasso min(n, cores) · speed / n (dt/n per un singolo
+    # core a velocità 1). Ogni job memorizza una sola volta il proprio finish tag
+    # (vtime all'arrivo + tempo di servizio a velocità 1), quindi l'avanzamento
+    # del tempo è O(1) e il prossimo completamento è la cima di un heap ordinato
+    # per finish tag.
+    def __init__(self, name, cores=1, speed=1.0):
         self.name = name
-        self.jobs = []
+        self.cores = cores
+        self.speed = speed
+        self.jobs = []          # heap di (finish_tag, seq, job)
+        self.vtime = 0.0
+        self.seq = 0
         self.last_t = 0.0
         self.cumulative_busy_time = 0.0
         self.area_num_in_system = 0.0
         self.num_arrivals = 0
         self.num_departures = 0
-        self.version = 0
 
     def update_progress(self, now):
         dt = now - self.last_t
@@ -69,51 +199,55 @@ class PSServer:
             return
         n = len(self.jobs)
         if n > 0:
-            per_job = dt / n
-
-            for job in self.jobs:
-                job.remaining -= per_job
-            self.cumulative_busy_time += dt
+            busy_cores = min(n, self.cores)
+            self.vtime += dt * self.speed * busy_cores / n
+            # utilizzazione come frazione dei core occupati
+            self.cumulative_busy_time += dt * busy_cores / self.cores
 
         self.area_num_in_system += n * dt
         self.last_t = now
 
     def process_arrival(self, job, service_time):
-        job.remaining = service_time
+        job.finish_tag = self.vtime + service_time
         job.server = self.name
-        self.jobs.append(job)
+        # seq: a parità di finish tag completa prima il job arrivato prima
+        heapq.heappush(self.jobs, (job.finish_tag, self.seq, job))
+        self.seq += 1
         self.num_arrivals += 1
 
-    def _remove_job(self, job):
-        if job in self.jobs:
-            self.jobs.remove(job)
+    # servizio residuo del job, a velocità 1
+    def remaining(self, job):
+        return job.finish_tag - self.vtime
+
+    def _remove_job(self):
+        _, _, job = heapq.heappop(self.jobs)
         self.num_departures += 1
         job.server = None
+        job.finish_tag = None
 
-    def process_completion(self, ev_version):
-        if ev_version != self.version:
-            return None
+        # Server vuoto: riparte da zero per non perdere precisione sui tag
+        if not self.jobs:
+            self.vtime = 0.0
 
-        job = self._job_to_complete()
-        if job is None:
-            return None
+        return job
 
-        self._remove_job(job)
+    def process_completion(self):
+        if not self.jobs:
+            return None
 
-        return job
+        return self._remove_job()
 
     def next_departure_time(self, now):
         if not self.jobs:
             return None
         n = len(self.jobs)
-        min_time = min(job.remaining * n for job in self.jobs)
-        return now + min_time
+        return now + (self.jobs[0][0] - self.vtime) * n / (self.speed * min(n, self.cores))
 
     def _job_to_complete(self):
-        return min(self.jobs, key=lambda j: j.remaining) if self.jobs else None
+        return self.jobs[0][2] if self.jobs else None
 
     def reset_statistics(self):
         self.cumulative_busy_time = 0.0
         self.area_num_in_system = 0.0
         self.num_arrivals = 0
-        self.num_departures = 0
\ No newline at end of file
+        self.num_departures = 0
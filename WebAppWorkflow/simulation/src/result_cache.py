@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+import shutil
+
+from src.results_io import load_run
+
+CACHE_FOLDER = "results/cache/"
+
+# Da incrementare a ogni modifica del simulatore che cambia i risultati a parità
+# di configurazione o lo stato salvato nei checkpoint: invalida tutte le voci della
+# cache e i checkpoint (la loro chiave è la stessa)
+SIMULATOR_VERSION = 3
+
+
+# Chiave della cache: hash della configurazione effettiva di una run (i suoi
+# metadati) serializzata in JSON canonico, insieme alla versione del simulatore
+def config_hash(metadata):
+    canonical = json.dumps({'simulator_version': SIMULATOR_VERSION, **metadata},
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _entry_path(metadata, folder):
+    return os.path.join(folder, f"{config_hash(metadata)}.npz")
+
+# (colonne, metadati) della run con questa configurazione se presente in cache,
+# altrimenti None. Una voce letta diventa la più recente per l'eviction LRU
+def cache_load(metadata, folder=CACHE_FOLDER):
+    path = _entry_path(metadata, folder)
+    if not os.path.exists(path):
+        return None
+
+    os.utime(path)
+    return load_run(path)
+
+# Copia in cache il file della run appena salvata, poi elimina le voci usate meno
+# di recente finché la cache non rientra in max_bytes
+def cache_store(metadata, run_path, max_bytes, folder=CACHE_FOLDER):
+    os.makedirs(folder, exist_ok=True)
+    shutil.copyfile(run_path, _entry_path(metadata, folder))
+    evict_lru(max_bytes, folder)
+
+def evict_lru(max_bytes, folder=CACHE_FOLDER):
+    entries = []
+    for name in os.listdir(folder):
+        if name.endswith(".npz"):
+            st = os.stat(os.path.join(folder, name))
+            entries.append((st.st_mtime_ns, st.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(folder, name))
+        total -= size
@@ -0,0 +1,72 @@
+import json
+import struct
+import zipfile
+
+import numpy as np
+
+META_KEY = "__meta__"
+
+# Dimensione fissa del local file header di un membro zip (prima di nome ed extra field)
+ZIP_LOCAL_HEADER_SIZE = 30
+
+
+# Salva una run in un unico file .npz non compresso: una colonna numerica per metrica
+# (array di qualsiasi shape, es. (repliche, campioni) o (k,)) più i metadati della
+# run (seme, scenario, λ, b, k, ...) serializzati in JSON
+def save_run(path, columns, metadata):
+    arrays = {name: np.asarray(values) for name, values in columns.items()}
+    arrays[META_KEY] = np.array(json.dumps(metadata))
+
+    # np.savez non comprime: i dati di ogni membro restano contigui nel file
+    np.savez(path, **arrays)
+
+    return path
+
+# Offset e header (shape, fortran_order, dtype) del .npy di un membro non compresso
+def _member_layout(f, info):
+    f.seek(info.header_offset)
+    local_header = f.read(ZIP_LOCAL_HEADER_SIZE)
+    name_len, extra_len = struct.unpack('<HH', local_header[26:30])
+    f.seek(info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_len + extra_len)
+
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+    return f.tell(), shape, fortran_order, dtype
+
+# Apre una run salvata con save_run e restituisce (colonne, metadati). Le colonne
+# sono np.memmap in sola lettura sui membri del file: nessun dato viene letto
+# finché non lo si usa
+def load_run(path):
+    columns = {}
+    metadata = {}
+
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            name = info.filename[:-len('.npy')]
+
+            if name == META_KEY:
+                with zf.open(info) as member:
+                    metadata = json.loads(str(np.lib.format.read_array(member)))
+                continue
+
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"load_run: membro compresso non mappabile: {info.filename}")
+
+            offset, shape, fortran_order, dtype = _member_layout(f, info)
+            if np.prod(shape) == 0:
+                # mmap non ammette mappe vuote
+                columns[name] = np.empty(shape, dtype=dtype)
+                continue
+            columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                                      order='F' if fortran_order else 'C')
+
+    return columns, metadata
+
+# Vista (repliche, campioni) di una metrica dell'array 'metrics' di una run a
+# orizzonte finito, selezionata per nome tramite i metadati
+def finite_metric(columns, metadata, metric_name):
+    return columns['metrics'][:, :, metadata['metric_names'].index(metric_name)]
@@ -0,0 +1,94 @@
+SINK = 'SINK'
+
+# Chiave dello stream delle diramazioni probabilistiche tra gli stream di servizio
+ROUTING_KEY = 'routing'
+
+
+# -------------------------------------------------------
+#                 Routing Table (compilata)
+# -------------------------------------------------------
+class RoutingTable:
+    # server_names: server della rete, nell'ordine dei loro indici (server_index).
+    # routes[i][c]: destinazioni all'uscita dal server server_names[i] per la classe
+    # di indice c (in class_names), come tupla di (probabilità cumulata, nodo
+    # successivo, indice della classe successiva, service demand medio nel nodo
+    # successivo); il nodo successivo è None per l'uscita dal sistema.
+    # entry: (nodo, indice della classe, service demand medio) dei job in arrivo
+    def __init__(self, server_names, routes, class_names, entry, probabilistic):
+        self.server_names = server_names
+        self.server_index = {name: i for i, name in enumerate(server_names)}
+        self.routes = routes
+        self.class_names = class_names
+        self.entry = entry
+        self.probabilistic = probabilistic
+
+
+# Destinazione scelta tra più diramazioni con l'uniforme u in (0, 1)
+def pick_branch(branches, u):
+    for cum_p, next_node, next_class, mean in branches:
+        if u < cum_p:
+            return next_node, next_class, mean
+    return branches[-1][1:]
+
+
+# Compila la tabella di routing {(nodo, classe): [(probabilità, nodo successivo,
+# classe successiva), ...]} in liste indicizzate da (indice del server, indice della
+# classe), con i service demand dei nodi di destinazione già risolti. I server della
+# rete sono i nodi di service_demands, nel loro ordine. Le coppie (nodo, classe) non
+# presenti nella tabella escono dal sistema.
+def compile_routing(table, entry, service_demands):
+    server_names = list(service_demands)
+    server_index = {name: i for i, name in enumerate(server_names)}
+
+    # Classi in ordine di prima apparizione (la classe d'ingresso è la 0)
+    class_names = [entry[1]]
+    for (node, job_class), branches in table.items():
+        for name in [job_class] + [next_class for _, next_node, next_class in branches if next_node != SINK]:
+            if name not in class_names:
+                class_names.append(name)
+    class_index = {name: c for c, name in enumerate(class_names)}
+
+    def demand(node, job_class):
+        if node not in server_index:
+            raise ValueError(f"compile_routing: nodo sconosciuto {node!r} (server: {server_names})")
+        try:
+            return service_demands[node][job_class]
+        except KeyError:
+            raise ValueError(f"compile_routing: service demand mancante per ({node!r}, {job_class!r})") from None
+
+    routes = [[((1.0, None, c, None),) for c in range(len(class_names))] for _ in server_names]
+    probabilistic = False
+
+    for (node, job_class), branches in table.items():
+        total = sum(p for p, _, _ in branches)
+        if abs(total - 1.0) > 1e-9:
+            raise ValueError(f"compile_routing: probabilità di ({node!r}, {job_class!r}) a somma {total}, non 1")
+        demand(node, job_class)
+
+        compiled = []
+        cum_p = 0.0
+        for p, next_node, next_class in branches:
+            cum_p += p
+            if next_node == SINK:
+                compiled.append((cum_p, None, class_index[job_class], None))
+            else:
+                compiled.append((cum_p, next_node, class_index[next_class], demand(next_node, next_class)))
+
+        # l'ultima diramazione copre anche gli arrotondamenti della somma
+        compiled[-1] = (1.0,) + compiled[-1][1:]
+        routes[server_index[node]][class_index[job_class]] = tuple(compiled)
+        probabilistic = probabilistic or len(compiled) > 1
+
+    entry_node, entry_class = entry
+    entry = (entry_node, class_index[entry_class], demand(entry_node, entry_class))
+
+    return RoutingTable(server_names, routes, class_names, entry, probabilistic)
+
+
+# Tabella di routing in forma serializzabile (JSON), per i metadati delle run
+def routing_metadata(table, entry):
+    return {
+        'entry': list(entry),
+        'table': [[node, job_class, [list(branch) for branch in branches]]
+                  for (node, job_class), branches in table.items()],
+    }
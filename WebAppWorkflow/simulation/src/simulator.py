@@ -1,29 +1,165 @@
-import heapq
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from tqdm import tqdm
 
 from sim_config import PLOT_VISITS, SEED, ARRIVAL_RATE, SERVICE_DEMANDS, ARRIVAL_STREAM, SERVICE_STREAMS, TS_STEP, \
-    SCENARIO, SEARCH_THR_BOUND
+    ROUTING, ENTRY_ROUTE, ROUTING_STREAM, SERVER_CORES, SERVER_SPEEDS, \
+    SCENARIO, SEARCH_THR_BOUND, NUM_WORKERS, BATCH_SEARCH_SINGLE_RUN, RECORD_RT_STREAM, TRACE_LEVEL, EXPORT_TEXT, \
+    RESULT_CACHE, RESULT_CACHE_MAX_MB, CHECKPOINT_BATCHES, REPETITION_CHUNK, CONTROL_VARIATES, scenario_parameters
 from src.entities import *
+from src.routing import compile_routing, pick_branch, routing_metadata, ROUTING_KEY
 from src.utils import *
-
-
-def schedule_departure(sname, now, servers, compl_q):
-    srv = servers[sname]
-    srv.version += 1
-    td = srv.next_departure_time(now)
-    if td is not None:
-        heapq.heappush(compl_q, CompletionEvent(td, (sname, srv.version)))
-
-def handle_arrival(clock, compl_q, servers, service_demands, arrival_stream, service_streams,
-                   arrival_rate, in_flight):
+from src.analytical import solve_open, validate_batches, visit_counts
+from src.stats import batch_means, batch_size_analysis, control_variate_analysis, paired_difference, precision_reached, replication_precision_reached
+from src.result_cache import cache_load, cache_store
+from src.checkpoint import checkpoint_path, save_checkpoint, load_checkpoint, append_checkpoint_rts, \
+    load_checkpoint_rts, remove_checkpoint
+
+TRACE = TRACE_LEVELS[TRACE_LEVEL]
+
+ROUTES = compile_routing(ROUTING, ENTRY_ROUTE, SERVICE_DEMANDS)
+
+# Server della rete: i nodi dei service demands della configurazione
+SERVER_NAMES = ROUTES.server_names
+
+
+# Ogni server della rete deve avere il proprio stream di servizio, numero di core e velocità
+def check_server_settings(server_names):
+    for name in server_names:
+        for setting, values in (('SERVICE_STREAMS', SERVICE_STREAMS), ('SERVER_CORES', SERVER_CORES),
+                                ('SERVER_SPEEDS', SERVER_SPEEDS)):
+            if name not in values:
+                raise ValueError(f"Server {name!r} mancante in {setting}")
+
+check_server_settings(SERVER_NAMES)
+
+# Lo stream del routing si aggiunge (e occupa un indice) solo se ci sono diramazioni
+# probabilistiche: con un routing deterministico gli stream restano quelli di sempre
+STREAMS = {**SERVICE_STREAMS, ROUTING_KEY: ROUTING_STREAM} if ROUTES.probabilistic else SERVICE_STREAMS
+
+# Estrazioni medie per job dallo stream più usato: uno per gli arrivi, le visite
+# a ogni server per il suo stream di servizio e, per lo stream del routing, le
+# visite alle coppie (server, classe) con più di una diramazione
+def max_draws_per_job(routing):
+    visits = visit_counts(routing)
+    draws = [1.0, *visits.sum(axis=1)]
+    if routing.probabilistic:
+        draws.append(sum(visits[i, c] for i, per_class in enumerate(routing.routes)
+                         for c, branches in enumerate(per_class) if len(branches) > 1))
+    return float(max(draws))
+
+DRAWS_PER_JOB = max_draws_per_job(ROUTES)
+
+# Avvisa se n_jobs job della replica replication richiedono a uno stream più
+# estrazioni di quelle che ha prima dell'inizio di un altro stream: oltre, due
+# sequenze che dovrebbero essere indipendenti si sovrappongono
+def check_stream_capacity(n_jobs, replication=0):
+    n_streams = 1 + max(ARRIVAL_STREAM, *STREAMS.values())
+    capacity = stream_capacity((replication + 1) * n_streams)
+    draws = n_jobs * DRAWS_PER_JOB
+    if draws > capacity:
+        print(f"[ATTENZIONE] ~{draws:,.0f} estrazioni dallo stream più usato, oltre le {capacity:,} "
+              f"prima dell'inizio di un altro stream: le sequenze si sovrappongono (ridurre k o b)")
+
+# Metriche su cui si valuta la precisione dell'arresto sequenziale delle repliche
+PRECISION_METRICS = ('RT', 'N_system')
+
+# Metriche dei batch stimate anche con le variabili di controllo
+CONTROL_VARIATE_METRICS = ('RT', 'N_system')
+
+
+# Le variabili di controllo sono metriche dei batch di media nota
+def check_control_variates(controls, server_names):
+    known = {'Interarrival', *(f'D_{name}' for name in server_names)}
+    for name in controls:
+        if name not in known:
+            raise ValueError(f"Variabile di controllo {name!r} sconosciuta in CONTROL_VARIATES")
+
+check_control_variates(CONTROL_VARIATES, SERVER_NAMES)
+
+# Metriche del confronto accoppiato tra scenari (medie sull'intera replica)
+COMPARISON_METRICS = ('RT', *(f'RT_{name}' for name in SERVER_NAMES), 'Throughput',
+                      *(f'U_{name}' for name in SERVER_NAMES))
+
+
+# Metadati comuni salvati con i risultati di una run, più quelli specifici (b, k, ...).
+# Descrivono la configurazione effettiva della run e ne sono quindi la chiave in cache
+def run_metadata(**extra):
+    return {
+        'seed': SEED,
+        'scenario': SCENARIO,
+        'arrival_rate': ARRIVAL_RATE,
+        'service_demands': SERVICE_DEMANDS,
+        'server_cores': SERVER_CORES,
+        'server_speeds': SERVER_SPEEDS,
+        'arrival_stream': ARRIVAL_STREAM,
+        'service_streams': STREAMS,
+        'routing': routing_metadata(ROUTING, ENTRY_ROUTE),
+        'trace': TRACE,
+        **extra,
+    }
+
+# Server dello scenario, con numero di core e velocità di ciascuno
+def make_servers(cores=SERVER_CORES, speeds=SERVER_SPEEDS, server_names=SERVER_NAMES):
+    return {name: PSServer(name, cores[name], speeds[name]) for name in server_names}
+
+# Soluzione analitica in stato stazionario della configurazione con tasso arrival_rate
+def analytical_solution(arrival_rate):
+    return solve_open(arrival_rate, ROUTES, SERVICE_DEMANDS, SERVER_CORES, SERVER_SPEEDS)
+
+# Medie note delle variabili di controllo di CONTROL_VARIATES: interarrivo medio 1 / λ
+# e service demand di ogni server dalla configurazione (solution: soluzione analitica)
+def control_variate_means(arrival_rate, solution):
+    means = {'Interarrival': 1.0 / arrival_rate, **{f'D_{name}': solution[f'D_{name}'] for name in SERVER_NAMES}}
+    return {name: means[name] for name in CONTROL_VARIATES}
+
+# Salva in cache il file della run appena prodotta
+def store_in_cache(metadata, path):
+    cache_store(metadata, path, RESULT_CACHE_MAX_MB * 1024 * 1024)
+
+def schedule_departure(sname, now, servers, calendar):
+    calendar.schedule(sname, servers[sname].next_departure_time(now))
+
+# Prossimo evento: il minimo tra l'arrivo e gli slot di completamento
+def next_event_time(clock, calendar):
+    compl_t, _ = calendar.peek()
+    if compl_t is None:
+        return clock.arrival
+    return min(compl_t, clock.arrival)
+
+# Registra l'ingresso del job nel server sname all'istante t (tempo di servizio st)
+def record_visit(job, sname, t, st, trace, routing):
+    if trace >= TRACE_AGGREGATES:
+        job.server_stats[2 * routing.server_index[sname]] += st
+        job.visit_start = t
+
+        if trace == TRACE_FULL:
+            if job.history is None:
+                job.history = []
+            # numero della visita al server: le precedenti sono nella history
+            visit_number = 1 + sum(1 for entry in job.history if entry[0] == sname)
+            job.history.append((sname, routing.class_names[job.current_class], visit_number, t, None))
+
+# Registra l'uscita del job dal server sname all'istante t
+def record_departure(job, sname, t, trace, routing):
+    if trace >= TRACE_AGGREGATES:
+        job.server_stats[2 * routing.server_index[sname] + 1] += t - job.visit_start
+
+        # la visita aperta è sempre l'ultima: un job è in un solo server alla volta
+        if trace == TRACE_FULL:
+            sname, job_class, visit_number, t_start, _ = job.history[-1]
+            job.history[-1] = (sname, job_class, visit_number, t_start, t)
+
+def handle_arrival(clock, calendar, servers, routing, arrival_stream, service_streams,
+                   arrival_rate, in_flight, trace=TRACE):
     # Schedule next arrival
     t_next_arr = clock.current + interarrival_time(arrival_rate, arrival_stream)
 
-    job = Job(clock.current)
+    entry_node, entry_class, mean = routing.entry
+    job = Job(clock.current, entry_class, clock.new_job_id(), len(routing.server_names))
     in_flight[job.id] = job
-    mean = service_demands['A'][job.current_class]
-    st = exp_sample(mean, service_streams['A'])
+    st = exp_sample(mean, service_streams[entry_node])
 
     #########################################
     # Per il plot della sequenza delle visite
@@ -32,97 +168,60 @@ def handle_arrival(clock, compl_q, servers, service_demands, arrival_stream, ser
         t_next_arr = clock.current + 3  # un arrivo ogni tre secondi
     #########################################
 
-    job.requested_service['A'] = job.requested_service.get('A', 0.0) + st
+    record_visit(job, entry_node, clock.current, st, trace, routing)
 
-    # aggiorna visita e history
-    job.visit_count['A'] = job.visit_count.get('A', 0) + 1
-    visit_number = job.visit_count['A']
-    job.history.append(('A', job.current_class, visit_number, clock.current, None))
-
-    servers['A'].process_arrival(job, st)
-    schedule_departure('A', clock.current, servers, compl_q)
+    servers[entry_node].process_arrival(job, st)
+    schedule_departure(entry_node, clock.current, servers, calendar)
 
     clock.update_arrival(t_next_arr)
 
-def handle_departure(t, compl_q, servers, service_demands,
-                     service_streams, in_flight, completed_jobs):
-    ev = heapq.heappop(compl_q)
-    sname, ev_version = ev.payload
-    srv = servers[sname]
-
-    job = srv.process_completion(ev_version)
-    if job is None:
-        # stale event
-        return
-
-    # Aggiorna la history del job
-    for i in range(len(job.history) - 1, -1, -1):
-        if job.history[i][0] == sname and job.history[i][4] is None:
-            job.history[i] = (
-                job.history[i][0],
-                job.history[i][1],
-                job.history[i][2],
-                job.history[i][3],
-                t
-            )
-            job.server_times[sname] = job.server_times.get(sname, 0.0) + (t - job.history[i][3])
-            break
-
-    schedule_departure(sname, t, servers, compl_q)
-
-    # Routing
-    nextn = next_node_after(sname, job)
-    if nextn == 'CS':
-        new_class = do_class_switch(job)
-        mean = service_demands['A'][new_class]
-        st = exp_sample(mean, service_streams['A'])
-
-        #########################################
-        # Per il plot della sequenza delle visite
-        if PLOT_VISITS:
-            st = mean
-        #########################################
-
-        job.requested_service['A'] = job.requested_service.get('A', 0.0) + st
+def handle_departure(t, calendar, servers, routing, service_streams, in_flight, completed_jobs, trace=TRACE):
+    _, sname = calendar.pop()
+    job = servers[sname].process_completion()
 
-        # aggiorna visita e history
-        job.visit_count['A'] = job.visit_count.get('A', 0) + 1
-        visit_number = job.visit_count['A']
-        job.history.append(('A', job.current_class, visit_number, t, None))
+    record_departure(job, sname, t, trace, routing)
 
-        servers['A'].process_arrival(job, st)
-        schedule_departure('A', t, servers, compl_q)
+    schedule_departure(sname, t, servers, calendar)
 
-    elif nextn in ['B', 'P']:
-        mean = service_demands[nextn][job.current_class]
-        st = exp_sample(mean, service_streams[nextn])
+    # Routing: destinazioni di (server, classe) nella tabella compilata; l'uniforme
+    # per la scelta si estrae solo se le destinazioni sono più di una
+    branches = routing.routes[routing.server_index[sname]][job.current_class]
+    if len(branches) == 1:
+        _, nextn, next_class, mean = branches[0]
+    else:
+        nextn, next_class, mean = pick_branch(branches, service_streams[ROUTING_KEY].random())
 
-        #########################################
-        # Per il plot della sequenza delle visite
-        if PLOT_VISITS:
-            st = mean
-        #########################################
+    if nextn is None:
+        job.finish = t
+        completed_jobs.append(job)
+        in_flight.pop(job.id, None)
+        return
 
-        job.requested_service[nextn] = job.requested_service.get(nextn, 0.0) + st
+    job.current_class = next_class
+    st = exp_sample(mean, service_streams[nextn])
 
-        # aggiorna visita e history
-        job.visit_count[nextn] = job.visit_count.get(nextn, 0) + 1
-        visit_number = job.visit_count[nextn]
-        job.history.append((nextn, job.current_class, visit_number, t, None))
+    #########################################
+    # Per il plot della sequenza delle visite
+    if PLOT_VISITS:
+        st = mean
+    #########################################
 
-        servers[nextn].process_arrival(job, st)
-        schedule_departure(nextn, t, servers, compl_q)
+    record_visit(job, nextn, t, st, trace, routing)
 
-    elif nextn == 'SINK':
-        job.finish = t
-        completed_jobs.append(job)
-        in_flight.pop(job.id, None)
+    servers[nextn].process_arrival(job, st)
+    schedule_departure(nextn, t, servers, calendar)
 
-def simulate_batch(max_completed_jobs, arrival_rate, service_demands, arrival_stream, service_streams,
-                   servers, compl_q,
-                   clock, in_flight):
+# Simula un batch di max_completed_jobs completamenti e restituisce le sue metriche
+# (dizionario di dimensione fissa): i job arrivati al SINK aggiornano solo le somme
+# correnti e vengono rilasciati. Se si passa rt_stream (array('d')), vi si accodano
+# i tempi di risposta dei job del batch in ordine di completamento.
+def simulate_batch(max_completed_jobs, arrival_rate, routing, arrival_stream, service_streams,
+                   servers, calendar,
+                   clock, in_flight, trace=TRACE, rt_stream=None):
 
-    completed_jobs = []
+    completed_jobs = CompletedJobs(routing.server_names, track_servers=trace >= TRACE_AGGREGATES, keep_columns=False,
+                                   rt_stream=rt_stream)
+    batch_start = clock.current
 
     # Ensure at least one arrival is scheduled
     if clock.arrival is None:
@@ -130,6 +229,11 @@ def simulate_batch(max_completed_jobs, arrival_rate, service_demands, arrival_st
         clock.update_arrival(t_next_arr)
         clock.update_next(clock.arrival)
 
+    # Ogni arrivo del batch estrae il tempo al successivo: la loro somma è
+    # l'avanzamento del prossimo arrivo programmato
+    first_arrival = clock.arrival
+    n_arrivals = 0
+
     # Main loop
     while len(completed_jobs) < max_completed_jobs:
         clock.update_current(clock.next)
@@ -140,104 +244,240 @@ def simulate_batch(max_completed_jobs, arrival_rate, service_demands, arrival_st
 
         # Process event
         if clock.current == clock.arrival:
-            handle_arrival(clock, compl_q, servers, service_demands, arrival_stream, service_streams,
-                           arrival_rate, in_flight)
+            n_arrivals += 1
+            handle_arrival(clock, calendar, servers, routing, arrival_stream, service_streams,
+                           arrival_rate, in_flight, trace)
         else:
-            handle_departure(clock.current, compl_q, servers, service_demands,
-                             service_streams, in_flight, completed_jobs)
+            handle_departure(clock.current, calendar, servers, routing,
+                             service_streams, in_flight, completed_jobs, trace)
 
-        if compl_q:
-            compl_ev = compl_q[0]
-            compl_t = compl_ev.time
-            next_ev = min(compl_t, clock.arrival)
+        clock.update_next(next_event_time(clock, calendar))
 
-        else:
-            next_ev = clock.arrival
+    metrics = compute_metrics_infinite(servers, completed_jobs, clock.current - batch_start)
 
-        clock.update_next(next_ev)
+    # Interarrivo medio estratto nel batch (variabile di controllo di media 1 / λ)
+    metrics['Interarrival'] = (clock.arrival - first_arrival) / n_arrivals if n_arrivals else 1.0 / arrival_rate
 
-    return completed_jobs, servers, in_flight, compl_q, clock
+    return metrics, servers, in_flight, calendar, clock
 
-def find_batch_b(k, b_values):
-    for b in b_values:
-        print(f"\n>>> Batch size b = {b}")
-        print("Simulation in progress...")
+# Medie dei tempi di risposta di k batch consecutivi di ampiezza b (seme SEED)
+def batch_rts_for_b(k, b):
+    rng = rngs.RngStreams(SEED)
+    arrival_stream, service_streams = make_streams(rng, ARRIVAL_STREAM, STREAMS)
 
-        rngs.plantSeeds(SEED)
+    servers = make_servers()
+    calendar = EventCalendar(SERVER_NAMES)
+    in_flight = {}
+    clock = Clock()
 
-        servers = {name: PSServer(name) for name in ['A', 'B', 'P']}
-        compl_q = []
-        in_flight = {}
-        clock = Clock()
+    batch_rts = []
 
-        batch_rts = []
-
-        for _ in range(k):
-            completed_batch, servers, in_flight, compl_q, clock = simulate_batch(
-                b,
-                ARRIVAL_RATE,
-                SERVICE_DEMANDS,
-                ARRIVAL_STREAM,
-                SERVICE_STREAMS,
-                servers,
-                compl_q,
-                clock,
-                in_flight
-            )
-
-            # calcolo mean response time del batch
-            if completed_batch:
-                mean_rt = sum(job.finish - job.birth for job in completed_batch) / len(completed_batch)
-            else:
-                mean_rt = 0.0
-
-            batch_rts.append(mean_rt)
-
-            # resetta solo le statistiche dei server
-            for srv in servers.values():
-                srv.reset_statistics()
+    for _ in range(k):
+        metrics, servers, in_flight, calendar, clock = simulate_batch(
+            b,
+            ARRIVAL_RATE,
+            ROUTES,
+            arrival_stream,
+            service_streams,
+            servers,
+            calendar,
+            clock,
+            in_flight,
+            TRACE_OFF
+        )
+
+        # mean response time del batch
+        batch_rts.append(metrics['RT'])
+
+        # resetta solo le statistiche dei server
+        for srv in servers.values():
+            srv.reset_statistics()
 
+    return batch_rts
+
+# Tempi di risposta dei primi n_jobs completamenti (seme SEED), in ordine di completamento
+def completed_response_times(n_jobs):
+    rng = rngs.RngStreams(SEED)
+    arrival_stream, service_streams = make_streams(rng, ARRIVAL_STREAM, STREAMS)
+
+    servers = make_servers()
+    calendar = EventCalendar(SERVER_NAMES)
+
+    # i job completati non vengono conservati: resta solo il loro tempo di risposta
+    rts = array('d')
+    simulate_batch(n_jobs, ARRIVAL_RATE, ROUTES, arrival_stream, service_streams,
+                   servers, calendar, Clock(), {}, TRACE_OFF, rts)
+
+    return rts
+
+def find_batch_b(k, b_values, num_workers=NUM_WORKERS, single_run=BATCH_SEARCH_SINGLE_RUN,
+                 use_cache=RESULT_CACHE):
+    metadata = run_metadata(k=k, b_values=list(b_values), single_run=single_run)
+    cached = cache_load(metadata) if use_cache else None
+
+    if cached is None:
+        check_stream_capacity(k * max(b_values))
+
+    if cached is not None:
+        print("\n✔ Risultati ripresi dalla cache")
+        columns, _ = cached
+        batch_rts_by_b = {b: columns[f"rt_batch_inf_{b}"] for b in b_values}
+        rts = columns.get('rt_stream')
+    elif single_run:
+        # Con lo stesso seme, i completamenti di una run più corta sono un prefisso
+        # di quelli di una run più lunga: i batch di ogni b si ricavano quindi dai
+        # primi k * b tempi di risposta di un'unica run di k * max(b) completamenti,
+        # con gli stessi valori che darebbe una simulazione per ogni b, a meno degli
+        # arrotondamenti della somma (np.mean somma in un ordine diverso dalla somma
+        # corrente di CompletedJobs, con differenze dell'ordine di 1e-15)
+        b_max = max(b_values)
+        print(f"\n>>> Unica simulazione di {k} x {b_max} completamenti")
+        print("Simulation in progress...")
+        rts = completed_response_times(k * b_max)
         print("Completed")
 
-        path = save_batch_rts(batch_rts, b, SCENARIO)
-        print(f"✔ Dati salvati in {path}")
+        batch_rts_by_b = {b: batch_means(rts, b, k) for b in b_values}
+    else:
+        # Un valore di b per worker; i risultati sono raccolti nell'ordine di b_values
+        print("\nSimulation in progress...")
+        rts = None
+        batch_rts_by_b = {}
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            results = pool.map(batch_rts_for_b, [k] * len(b_values), b_values)
+
+            for b, batch_rts in zip(b_values, results):
+                print(f"\n>>> Batch size b = {b}")
+                print("Completed")
+                batch_rts_by_b[b] = batch_rts
+
+    path = save_batch_search(batch_rts_by_b, SCENARIO, metadata, rts, EXPORT_TEXT)
+    print(f"✔ Batch di ogni b salvati in {path}")
+    if use_cache and cached is None:
+        store_in_cache(metadata, path)
+
+    if rts is not None:
+        print_batch_size_analysis(batch_size_analysis(rts, k), k)
+
+# replication: blocco di stream da usare (0 = stream di plantSeeds(SEED)),
+# per dare a più run indipendenti stream disgiunti
+# record_rts: registra anche la sequenza dei tempi di risposta (in ordine di
+# completamento), da cui ricavare i batch per ogni b senza nuove simulazioni
+# checkpoint: salva lo stato dopo ogni batch e riprende una run interrotta con la
+# stessa configurazione dall'ultimo batch completato
+# precision: arresto sequenziale, k è il numero massimo di batch e la run si ferma
+# al primo batch (almeno min_batches) in cui la semi-ampiezza dell'intervallo di
+# confidenza sulla media dei tempi di risposta dei batch è entro precision · media
+def infinite_horizon_simulation(k, b, arrival_rate, replication=0, show_progress=True,
+                                record_rts=RECORD_RT_STREAM, trace=TRACE, use_cache=RESULT_CACHE,
+                                checkpoint=CHECKPOINT_BATCHES, precision=None, min_batches=2):
+    metadata = run_metadata(arrival_rate=arrival_rate, b=b, k=k, replication=replication, trace=trace,
+                            record_rts=record_rts)
+    if precision is not None:
+        metadata.update(precision=precision, min_batches=min_batches)
+    use_cache = use_cache and not SEARCH_THR_BOUND
+    cached = cache_load(metadata) if use_cache else None
+    ckpt_path = checkpoint_path(metadata) if checkpoint and not SEARCH_THR_BOUND else None
+
+    if cached is not None:
+        if show_progress:
+            print("✔ Risultati ripresi dalla cache")
+        columns, _ = cached
+        rts = columns.pop('rt_stream', None)
+        n_batches = len(columns['RT'])
+        batch_stats = [{key: float(values[i]) for key, values in columns.items()} for i in range(n_batches)]
+    else:
+        # con l'arresto sequenziale k è il numero massimo di batch
+        check_stream_capacity(k * b, replication)
+        batch_stats, rts = simulate_batches(k, b, arrival_rate, replication, show_progress, record_rts, trace,
+                                            ckpt_path, precision, min_batches)
+
+    if precision is not None and show_progress:
+        print_sequential_stopping(batch_stats, precision, k)
+
+    if not SEARCH_THR_BOUND:
+        path = save_infinite_metrics(batch_stats, SCENARIO, metadata, rts, EXPORT_TEXT)
+        if use_cache and cached is None:
+            store_in_cache(metadata, path)
 
-def infinite_horizon_simulation(k, b, arrival_rate):
-    rngs.plantSeeds(SEED)
+    # run completata e salvata: il checkpoint non serve più
+    if ckpt_path is not None:
+        remove_checkpoint(ckpt_path)
 
-    # inizializzo sistema
-    servers = {name: PSServer(name) for name in ['A', 'B', 'P']}
-    compl_q = []
-    in_flight = {}
-    clock = Clock()
-    last_completion_time = 0.0
+    if rts is not None and show_progress:
+        print_batch_size_analysis(batch_size_analysis(rts, len(batch_stats)), len(batch_stats))
+
+    if show_progress:
+        solution = analytical_solution(arrival_rate)
+        saturated = arrival_rate >= solution['Throughput_bound']
+
+        # oltre il bound i batch non sono stazionari: niente variabili di controllo
+        if not saturated:
+            print_control_variates(control_variate_analysis(batch_stats, CONTROL_VARIATE_METRICS,
+                                                            control_variate_means(arrival_rate, solution)),
+                                   len(batch_stats))
+        print_model_validation(validate_batches(batch_stats, solution), saturated)
+
+    return batch_stats
+
+# Simula k batch consecutivi di b completamenti: restituisce le metriche di ogni
+# batch e, se record_rts, la sequenza dei tempi di risposta (altrimenti None).
+# Con ckpt_path, dopo ogni batch salva l'intero stato (server, calendario, job in
+# volo, clock e stato degli stream) e, se il checkpoint esiste già, riparte da lì
+# con gli stessi risultati di una run senza interruzioni.
+# Con precision, si ferma prima di k batch appena la media dei tempi di risposta
+# dei batch (almeno min_batches) raggiunge la precisione relativa richiesta
+def simulate_batches(k, b, arrival_rate, replication, show_progress, record_rts, trace, ckpt_path=None,
+                     precision=None, min_batches=2):
+    state = load_checkpoint(ckpt_path) if ckpt_path is not None else None
+
+    if state is not None:
+        start = state['batch']
+        servers = state['servers']
+        calendar = state['calendar']
+        in_flight = state['in_flight']
+        clock = state['clock']
+        arrival_stream = state['arrival_stream']
+        service_streams = state['service_streams']
+        batch_stats = state['batch_stats']
+        rts = load_checkpoint_rts(ckpt_path, state['n_rts']) if record_rts else None
+        if show_progress:
+            print(f"✔ Ripresa dal checkpoint dopo {start} batch su {k}")
+    else:
+        start = 0
+        if ckpt_path is not None:
+            # tempi di risposta rimasti da una run interrotta prima del primo checkpoint
+            remove_checkpoint(ckpt_path)
+        arrival_stream, service_streams = replication_streams(SEED, replication, ARRIVAL_STREAM, STREAMS)
+
+        # inizializzo sistema
+        servers = make_servers()
+        calendar = EventCalendar(SERVER_NAMES)
+        in_flight = {}
+        clock = Clock()
+
+        batch_stats = []
+        rts = array('d') if record_rts else None
 
-    batch_stats = []
+    for i in tqdm(range(start, k), initial=start, total=k, desc="Simulation in progress...", ascii="░▒▓█",
+                  ncols=100, disable=not show_progress):
+        # controllato a inizio batch, così vale anche per lo stato ripreso da un checkpoint
+        if precision is not None and len(batch_stats) >= min_batches and \
+                precision_reached([m['RT'] for m in batch_stats], precision):
+            break
 
-    for _ in tqdm(range(k), desc="Simulation in progress...", ascii="░▒▓█", ncols=100):
-        completed_batch, servers, in_flight, compl_q, clock = simulate_batch(
+        n_rts = len(rts) if rts is not None else 0
+        metrics, servers, in_flight, calendar, clock = simulate_batch(
             b,
             arrival_rate,
-            SERVICE_DEMANDS,
-            ARRIVAL_STREAM,
-            SERVICE_STREAMS,
+            ROUTES,
+            arrival_stream,
+            service_streams,
             servers,
-            compl_q,
+            calendar,
             clock,
-            in_flight
-        )
-
-        # calcolo durata batch
-        batch_start = last_completion_time
-        batch_end = clock.current
-        duration = batch_end - batch_start
-        last_completion_time = batch_end
-
-        # --- Compute metrics ---
-        metrics = compute_metrics_infinite(
-            servers,
-            completed_batch,
-            duration
+            in_flight,
+            trace,
+            rts
         )
 
         batch_stats.append(metrics)
@@ -246,23 +486,41 @@ def infinite_horizon_simulation(k, b, arrival_rate):
         for srv in servers.values():
             srv.reset_statistics()
 
-    print("Completed")
-
-    if not SEARCH_THR_BOUND:
-        save_infinite_metrics(batch_stats, SCENARIO)
+        if ckpt_path is not None:
+            # prima i tempi di risposta del batch, poi lo stato che ne registra il numero
+            if rts is not None:
+                append_checkpoint_rts(ckpt_path, rts[n_rts:])
+            save_checkpoint(ckpt_path, {
+                'batch': i + 1,
+                'servers': servers,
+                'calendar': calendar,
+                'in_flight': in_flight,
+                'clock': clock,
+                'arrival_stream': arrival_stream,
+                'service_streams': service_streams,
+                'batch_stats': batch_stats,
+                'n_rts': len(rts) if rts is not None else 0,
+            })
+
+    if show_progress:
+        print("Completed")
+        print_calendar_stats(calendar)
 
-    return batch_stats
+    return batch_stats, rts
 
 
-def simulate_finite(stop_time, arrival_rate, service_demands, arrival_stream, service_streams, ts_step):
-    Job._id = 0
+# Le metriche campionate derivano dalle somme correnti: i job completati sono
+# conservati solo con keep_completed (colonne) o con tracciamento completo (oggetti)
+def simulate_finite(stop_time, arrival_rate, routing, arrival_stream, service_streams, ts_step,
+                    trace=TRACE, keep_completed=False, cores=SERVER_CORES, speeds=SERVER_SPEEDS):
     clock = Clock()
     next_sample_time = 0.0
 
-    servers = {name: PSServer(name) for name in ['A','B','P']}
-    compl_q = []
+    servers = make_servers(cores, speeds, routing.server_names)
+    calendar = EventCalendar(routing.server_names)
     total_system_arrivals = 0
-    completed_jobs = []
+    completed_jobs = CompletedJobs(routing.server_names, track_servers=trace >= TRACE_AGGREGATES, keep_columns=keep_completed,
+                                   keep_jobs=trace == TRACE_FULL)
     in_flight = {}
 
     # Lista finale di campioni: ogni elemento è un dict con tutte le metriche
@@ -295,21 +553,13 @@ def simulate_finite(stop_time, arrival_rate, service_demands, arrival_stream, se
         # Process event
         if clock.current == clock.arrival:
             total_system_arrivals += 1
-            handle_arrival(clock, compl_q, servers, service_demands, arrival_stream, service_streams,
-                           arrival_rate, in_flight)
+            handle_arrival(clock, calendar, servers, routing, arrival_stream, service_streams,
+                           arrival_rate, in_flight, trace)
         else:
-            handle_departure(clock.current, compl_q, servers, service_demands,
-                             service_streams, in_flight, completed_jobs)
+            handle_departure(clock.current, calendar, servers, routing,
+                             service_streams, in_flight, completed_jobs, trace)
 
-        if compl_q:
-            compl_ev = compl_q[0]
-            compl_t = compl_ev.time
-            next_ev = min(compl_t, clock.arrival)
-
-        else:
-            next_ev = clock.arrival
-
-        clock.update_next(next_ev)
+        clock.update_next(next_event_time(clock, calendar))
 
     for srv in servers.values():
         srv.update_progress(stop_time)
@@ -319,43 +569,179 @@ def simulate_finite(stop_time, arrival_rate, service_demands, arrival_stream, se
         sampled_metrics.append(metrics)
         next_sample_time += ts_step
 
-    return sampled_metrics, total_system_arrivals, completed_jobs, in_flight, servers
-
-# Esegue una simulazione a orizzonte finito per un certo numero di volte
-def finite_horizon_simulation(stop_time, num_repetitions):
-    rngs.plantSeeds(SEED)
-    all_replicas_metrics = []
-    arrivals_per_run = []
-
-    for _ in tqdm(range(num_repetitions), desc="Simulation in progress...", ascii="░▒▓█", ncols=100):
-        metrics, total_system_arrivals, completed_jobs, in_flight, servers = simulate_finite(
-            stop_time,
-            ARRIVAL_RATE,
-            SERVICE_DEMANDS,
-            ARRIVAL_STREAM,
-            SERVICE_STREAMS,
-            TS_STEP
+    return sampled_metrics, total_system_arrivals, completed_jobs, in_flight, servers, calendar
+
+# Esegue la replica r (0-based) a orizzonte finito, con stream ottenuti per salto diretto
+def run_replication(r, stop_time):
+    arrival_stream, service_streams = replication_streams(SEED, r, ARRIVAL_STREAM, STREAMS)
+    return simulate_finite(
+        stop_time,
+        ARRIVAL_RATE,
+        ROUTES,
+        arrival_stream,
+        service_streams,
+        TS_STEP
+    )
+
+# Versione della replica per i processi worker: restituisce solo i campioni, come
+# array (campioni, metriche) con i nomi delle metriche, e il numero di arrivi,
+# senza serializzare job e server verso il processo padre
+def run_replication_metrics(r, stop_time):
+    metrics, total_system_arrivals, _, _, _, _ = run_replication(r, stop_time)
+    metric_names, values = metrics_matrix(metrics)
+    return metric_names, values, total_system_arrivals
+
+# Esegue le repliche first .. first + count - 1 (sul pool, se presente) e ne accoda
+# campioni e arrivi, in ordine di replica; restituisce i nomi delle metriche
+def run_replications(first, count, stop_time, pool, all_replicas_values, arrivals_per_run, progress):
+    replicas = range(first, first + count)
+
+    if pool is not None:
+        results = pool.map(run_replication_metrics, replicas, [stop_time] * count)
+        for metric_names, values, total_system_arrivals in results:
+            arrivals_per_run.append(total_system_arrivals)
+            all_replicas_values.append(values)
+            progress.update()
+        return metric_names
+
+    for r in replicas:
+        metrics, total_system_arrivals, completed_jobs, in_flight, servers, calendar = run_replication(
+            r, stop_time
         )
 
+        metric_names, values = metrics_matrix(metrics)
         arrivals_per_run.append(total_system_arrivals)
-        all_replicas_metrics.append(metrics)
+        all_replicas_values.append(values)
+        progress.update()
 
         #########################################
         # Per il plot della sequenza delle visite
         if PLOT_VISITS:
-            plot_job_visit_sequence(completed_jobs, SCENARIO)
+            plot_job_visit_sequence(completed_jobs.jobs, SCENARIO)
         #########################################
 
-        if num_repetitions == 1:
-            print_arrivals_and_completions(total_system_arrivals, completed_jobs, in_flight, servers)
+        if first == 0 and count == 1:
+            print_arrivals_and_completions(total_system_arrivals, completed_jobs, in_flight, servers, calendar)
+
+    return metric_names
+
+# Esegue una simulazione a orizzonte finito per un certo numero di volte.
+# precision: le repliche si aggiungono a blocchi di chunk (al più num_repetitions,
+# almeno min_repetitions) finché, in ogni tempo di campionamento, la semi-ampiezza
+# dell'intervallo di confidenza di RT e N_system è entro precision · media
+def finite_horizon_simulation(stop_time, num_repetitions, num_workers=NUM_WORKERS, use_cache=RESULT_CACHE,
+                              precision=None, min_repetitions=2, chunk=REPETITION_CHUNK):
+    metadata = run_metadata(stop_time=stop_time, ts_step=TS_STEP, num_repetitions=num_repetitions)
+    if precision is not None:
+        metadata.update(precision=precision, min_repetitions=min_repetitions, chunk=chunk)
+    use_cache = use_cache and not PLOT_VISITS
+    cached = cache_load(metadata) if use_cache else None
+
+    if cached is not None:
+        print("✔ Risultati ripresi dalla cache")
+        columns, cached_metadata = cached
+        metric_names = cached_metadata.pop('metric_names')
+        save_finite_metrics(columns['metrics'], metric_names, columns['total_arrivals'].tolist(),
+                            SCENARIO, cached_metadata, EXPORT_TEXT)
+        return
+
+    # in media ARRIVAL_RATE · stop_time job per replica
+    check_stream_capacity(ARRIVAL_RATE * stop_time, num_repetitions - 1)
+
+    all_replicas_values = []
+    arrivals_per_run = []
+
+    # Le repliche sono indipendenti (stream per salto diretto): con più worker
+    # vengono distribuite su un pool di processi e raccolte in ordine di replica,
+    # quindi i risultati (e il numero di repliche dell'arresto sequenziale) non
+    # dipendono dal numero di worker
+    use_pool = num_workers > 1 and num_repetitions > 1 and not PLOT_VISITS
+    pool = ProcessPoolExecutor(max_workers=num_workers) if use_pool else None
+    progress = tqdm(total=num_repetitions, desc="Simulation in progress...", ascii="░▒▓█", ncols=100)
+
+    try:
+        if precision is None:
+            metric_names = run_replications(0, num_repetitions, stop_time, pool, all_replicas_values,
+                                            arrivals_per_run, progress)
+        else:
+            while len(all_replicas_values) < num_repetitions:
+                done = len(all_replicas_values)
+                metric_names = run_replications(done, min(chunk, num_repetitions - done), stop_time, pool,
+                                                all_replicas_values, arrivals_per_run, progress)
+
+                if len(all_replicas_values) >= min_repetitions and replication_precision_reached(
+                        np.stack(all_replicas_values), metric_names, PRECISION_METRICS, precision):
+                    break
+    finally:
+        progress.close()
+        if pool is not None:
+            pool.shutdown()
 
     print("Completed")
 
+    if precision is not None:
+        print_adaptive_replications(np.stack(all_replicas_values), metric_names, PRECISION_METRICS, precision,
+                                    num_repetitions)
+
     if not PLOT_VISITS:
-        save_finite_metrics(all_replicas_metrics, num_repetitions, SCENARIO)
-        save_finite_total_arrivals(arrivals_per_run, SCENARIO)
+        # array denso (repliche, campioni, metriche), con il numero di repliche eseguite
+        saved_metadata = {**metadata, 'num_repetitions': len(all_replicas_values)}
+        path = save_finite_metrics(np.stack(all_replicas_values), metric_names, arrivals_per_run, SCENARIO,
+                                   saved_metadata, EXPORT_TEXT)
+        if use_cache:
+            store_in_cache(metadata, path)
+
+# Replica r a orizzonte finito dello scenario indicato: gli stream dipendono solo da
+# r, quindi le repliche r di scenari diversi usano gli stessi numeri casuali (arrivi
+# e servizio di ogni server, con demand diversi ottenuti per inversione dalle stesse
+# uniformi). Restituisce le metriche a stop_time (medie sull'intera replica)
+def run_scenario_replication(scenario, r, stop_time):
+    arrival_rate, service_demands, cores, speeds = scenario_parameters(scenario)
+    routing = compile_routing(ROUTING, ENTRY_ROUTE, service_demands)
+    arrival_stream, service_streams = replication_streams(SEED, r, ARRIVAL_STREAM, STREAMS)
+
+    metrics, _, _, _, _, _ = simulate_finite(stop_time, arrival_rate, routing, arrival_stream, service_streams,
+                                             stop_time, cores=cores, speeds=speeds)
+    return metrics[-1]
+
+# Confronto accoppiato tra due scenari con numeri casuali comuni: num_repetitions
+# repliche di ciascuno (in parallelo), poi, per ogni metrica, intervallo di
+# confidenza della differenza scenario_b - scenario_a replica per replica
+def compare_scenarios(scenario_a, scenario_b, stop_time, num_repetitions, num_workers=NUM_WORKERS):
+    jobs = [(scenario, r) for scenario in (scenario_a, scenario_b) for r in range(num_repetitions)]
+
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        results = list(tqdm(pool.map(run_scenario_replication, *zip(*jobs), [stop_time] * len(jobs)),
+                            total=len(jobs), desc="Simulation in progress...", ascii="░▒▓█", ncols=100))
+
+    print("Completed")
+
+    runs_a, runs_b = results[:num_repetitions], results[num_repetitions:]
+    rows = []
+    for name in COMPARISON_METRICS:
+        if name not in runs_a[0]:
+            continue
+        x = [m[name] for m in runs_a]
+        y = [m[name] for m in runs_b]
+        rows.append({'metric': name, 'mean_a': float(np.mean(x)), 'mean_b': float(np.mean(y)),
+                     **paired_difference(x, y)})
+
+    print_scenario_comparison(rows, scenario_a, scenario_b, num_repetitions)
+    return rows
 
-def compute_throughput_vs_lambda(scenario):
+# Throughput medio (sui batch) di una run a orizzonte infinito con tasso lam
+def throughput_at_lambda(i, lam):
+    # Lancia simulazione a orizzonte infinito
+    metrics = infinite_horizon_simulation(k=128, b=1024, arrival_rate=lam, replication=i, show_progress=False,
+                                          trace=TRACE_OFF)
+
+    # Estrai throughput batch-level
+    thr_list = [m["Throughput"] for m in metrics]
+
+    # Throughput medio della run
+    return float(np.mean(thr_list))
+
+def compute_throughput_vs_lambda(scenario, num_workers=NUM_WORKERS):
     # Parametri simulazione
     lambda_start = 0.5
     lambda_end = 1.35
@@ -364,24 +750,25 @@ def compute_throughput_vs_lambda(scenario):
     # Costruiamo la lista dei lambda
     lambda_values = np.arange(lambda_start, lambda_end + 1e-9, lambda_step)
 
-    throughput_values = []
-
-    for lam in lambda_values:
-        print(f"Lambda = {lam:.2f}")
-
-        # Lancia simulazione a orizzonte infinito
-        metrics = infinite_horizon_simulation(k=128, b=1024, arrival_rate=lam)
+    throughput_values = [None] * len(lambda_values)
 
-        # Estrai throughput batch-level
-        thr_list = [m["Throughput"] for m in metrics]
+    # Ogni punto λ è una run indipendente con il proprio blocco di stream (indice
+    # del punto): i punti girano in parallelo e ciascun risultato viene stampato
+    # appena pronto e messo al suo posto, quindi la curva non dipende dall'ordine
+    # di completamento né dal numero di worker
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        futures = {pool.submit(throughput_at_lambda, i, lam): i for i, lam in enumerate(lambda_values)}
 
-        # Throughput medio della run
-        thr_mean = np.mean(thr_list)
-        throughput_values.append(thr_mean)
+        for future in as_completed(futures):
+            i = futures[future]
+            thr_mean = future.result()
+            throughput_values[i] = thr_mean
 
-        print(f"  → Throughput medio: {thr_mean:.6f}\n")
+            print(f"Lambda = {lambda_values[i]:.2f}  → Throughput medio: {thr_mean:.6f}")
 
-    # Plot thr vs. lambda
-    plot_throughput_vs_lambda(lambda_values, throughput_values, scenario)
+    # Plot thr vs. lambda, con il throughput analitico min(λ, bound)
+    analytical_values = [analytical_solution(lam)['Throughput'] for lam in lambda_values]
+    plot_throughput_vs_lambda(lambda_values, throughput_values, analytical_values,
+                              analytical_solution(ARRIVAL_RATE)['Throughput_bound'], scenario)
 
     return lambda_values, throughput_values
\ No newline at end of file
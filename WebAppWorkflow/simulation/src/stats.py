@@ -0,0 +1,195 @@
+from math import sqrt
+
+import numpy as np
+
+from lib.DES import rvms
+
+CONFIDENCE = 0.95           # livello di confidenza degli intervalli
+LAG1_THRESHOLD = 0.2        # soglia di autocorrelazione per batch "indipendenti"
+CV_BATCHES_PER_PARAMETER = 10   # batch minimi per parametro (q controlli + media) delle variabili di controllo
+
+
+# Media campionaria e semi-ampiezza dell'intervallo di confidenza Student-t
+# (come lib/DES/estimate.py: w = t* · stdev / sqrt(n - 1))
+def student_t_interval(values, confidence=CONFIDENCE):
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    mean = float(np.mean(x)) if n > 0 else 0.0
+    if n < 2:
+        return mean, float('inf')
+
+    stdev = float(np.std(x))
+    t_star = rvms.idfStudent(n - 1, 1.0 - 0.5 * (1.0 - confidence))
+    return mean, t_star * stdev / sqrt(n - 1)
+
+
+# True se la semi-ampiezza dell'intervallo di confidenza è al più precision volte
+# la media (precisione relativa), come criterio di arresto sequenziale
+def precision_reached(values, precision, confidence=CONFIDENCE):
+    mean, half_width = student_t_interval(values, confidence)
+    return mean != 0 and half_width <= precision * abs(mean)
+
+
+# Media, varianza e semi-ampiezza Student-t lungo le repliche (asse 0) di un array
+# (repliche, ...): vettoriale, con gli stessi calcoli di student_t_interval
+def replication_summary(values, confidence=CONFIDENCE):
+    x = np.asarray(values, dtype=float)
+    n = x.shape[0]
+    mean = x.mean(axis=0)
+    variance = x.var(axis=0)
+    if n < 2:
+        half_width = np.full_like(mean, float('inf'))
+    else:
+        t_star = rvms.idfStudent(n - 1, 1.0 - 0.5 * (1.0 - confidence))
+        half_width = t_star * np.sqrt(variance) / sqrt(n - 1)
+
+    return {'n': n, 'mean': mean, 'variance': variance, 'half_width': half_width}
+
+
+# Precisione relativa (semi-ampiezza / |media|) lungo le repliche (asse 0): nulla
+# dove anche la semi-ampiezza è nulla (es. il campione a t = 0, sempre zero)
+def relative_half_width(values, confidence=CONFIDENCE):
+    summary = replication_summary(values, confidence)
+    half_width = summary['half_width']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(half_width == 0, 0.0, half_width / np.abs(summary['mean']))
+
+
+# True se, per le metriche indicate dell'array (repliche, campioni, metriche),
+# la precisione relativa è entro precision in ogni tempo di campionamento
+def replication_precision_reached(values, metric_names, metrics, precision, confidence=CONFIDENCE):
+    columns = [metric_names.index(name) for name in metrics]
+    return bool(np.all(relative_half_width(values[:, :, columns], confidence) <= precision))
+
+
+# Confronto accoppiato di due campioni y - x (stessa replica su numeri casuali
+# comuni): media e semi-ampiezza delle differenze, semi-ampiezza che avrebbe la
+# differenza con campioni indipendenti e rapporto tra le varianze (quante repliche
+# indipendenti servirebbero per ognuna accoppiata, a parità di semi-ampiezza)
+def paired_difference(x, y, confidence=CONFIDENCE):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mean, half_width = student_t_interval(y - x, confidence)
+    _, half_width_x = student_t_interval(x, confidence)
+    _, half_width_y = student_t_interval(y, confidence)
+
+    var_d = float(np.var(y - x))
+    var_sum = float(np.var(x) + np.var(y))
+    return {
+        'mean': mean,
+        'half_width': half_width,
+        'independent_half_width': sqrt(half_width_x ** 2 + half_width_y ** 2),
+        'variance_ratio': var_sum / var_d if var_d > 0 else float('inf'),
+    }
+
+
+# Variabili di controllo: media di values corretta con β · (C̄ - μ), dove β è il
+# coefficiente della regressione lineare di values sulle colonne di controls
+# (n, q), di medie note control_means. Semi-ampiezza Student-t con n - q - 1 gradi
+# di libertà sulla varianza dei residui (Law & Kelton); senza gradi di libertà
+# sufficienti restituisce la media semplice con semi-ampiezza infinita
+def control_variate_interval(values, controls, control_means, confidence=CONFIDENCE):
+    y = np.asarray(values, dtype=float)
+    c = np.asarray(controls, dtype=float).reshape(len(y), -1)
+    n, q = c.shape
+    if n - q - 1 < 1:
+        return (float(np.mean(y)) if n > 0 else 0.0), float('inf')
+
+    y_dev = y - y.mean()
+    c_dev = c - c.mean(axis=0)
+    s_cc = np.linalg.pinv(c_dev.T @ c_dev)
+    beta = s_cc @ (c_dev.T @ y_dev)
+    shift = c.mean(axis=0) - np.asarray(control_means, dtype=float)
+
+    mean = float(y.mean() - beta @ shift)
+    residuals = y_dev - c_dev @ beta
+    variance = (residuals @ residuals) / (n - q - 1) * (1.0 / n + shift @ s_cc @ shift)
+    t_star = rvms.idfStudent(n - q - 1, 1.0 - 0.5 * (1.0 - confidence))
+    return mean, t_star * sqrt(variance)
+
+
+# Autocorrelazione a lag 1 (stesso stimatore di lib/DES/acs.py)
+def lag1_autocorrelation(values):
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    if n < 2:
+        return 0.0
+
+    mean = np.mean(x)
+    var = np.mean(x * x) - mean * mean
+    if var <= 0:
+        return 0.0
+    cov = np.dot(x[:-1], x[1:]) / (n - 1) - mean * mean
+    return float(cov / var)
+
+
+# Medie dei primi k batch di ampiezza b della sequenza (in ordine di completamento)
+def batch_means(values, b, k):
+    x = np.asarray(values, dtype=float)
+    if k * b > len(x):
+        raise ValueError(f"batch_means: servono {k * b} valori, disponibili {len(x)}")
+    return x[:k * b].reshape(k, b).mean(axis=1)
+
+
+# Per ogni b potenza di 2 (con k batch interi disponibili): media, semi-ampiezza
+# dell'intervallo di confidenza e autocorrelazione a lag 1 delle medie dei batch
+def batch_size_analysis(values, k, confidence=CONFIDENCE):
+    rows = []
+    b = 1
+    while k * b <= len(values):
+        means = batch_means(values, b, k)
+        mean, half_width = student_t_interval(means, confidence)
+        rows.append({
+            'b': b,
+            'mean': mean,
+            'half_width': half_width,
+            'lag1': lag1_autocorrelation(means),
+        })
+        b *= 2
+    return rows
+
+
+# Per ogni metrica dei batch: intervallo semplice e intervallo con variabili di
+# controllo, usando come controlli le metriche dei batch di media nota in
+# known_means ({nome: media}). I controlli vanno fissati prima di guardare i batch:
+# sceglierli, o scegliere tra i due stimatori, in base agli stessi batch rende
+# l'intervallo ottimista. variance_reduction è la riduzione relativa della varianza
+# dello stimatore (negativa se i controlli non aiutano), cioè la frazione di batch
+# risparmiabile a parità di semi-ampiezza. Con meno di CV_BATCHES_PER_PARAMETER
+# batch per parametro l'intervallo con variabili di controllo non si calcola
+# (applied = False, restano i valori semplici)
+def control_variate_analysis(batch_stats, metrics, known_means, confidence=CONFIDENCE):
+    controls = list(known_means)
+    c = [[m[name] for name in controls] for m in batch_stats]
+    mu = [known_means[name] for name in controls]
+    applied = len(controls) > 0 and len(batch_stats) >= CV_BATCHES_PER_PARAMETER * (len(controls) + 1)
+
+    rows = []
+    for name in metrics:
+        y = [m[name] for m in batch_stats]
+        mean, half_width = student_t_interval(y, confidence)
+        cv_mean, cv_half_width = mean, half_width
+        reduction = 0.0
+        if applied:
+            cv_mean, cv_half_width = control_variate_interval(y, c, mu, confidence)
+            if 0 < half_width < float('inf'):
+                reduction = 1.0 - (cv_half_width / half_width) ** 2
+        rows.append({
+            'metric': name,
+            'mean': mean,
+            'half_width': half_width,
+            'cv_mean': cv_mean,
+            'cv_half_width': cv_half_width,
+            'variance_reduction': reduction,
+            'applied': applied,
+            'controls': controls,
+        })
+    return rows
+
+
+# Il più piccolo b la cui autocorrelazione a lag 1 è sotto la soglia (None se nessuno)
+def smallest_uncorrelated_b(rows, threshold=LAG1_THRESHOLD):
+    for row in rows:
+        if abs(row['lag1']) < threshold:
+            return row['b']
+    return None
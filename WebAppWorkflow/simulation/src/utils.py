@@ -1,12 +1,15 @@
 import os
 import time
+from math import log
 
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 from collections import OrderedDict, defaultdict
 
-from lib.DES import rvgs, rngs
+from lib.DES import rngs
+from src.results_io import save_run
+from src.stats import smallest_uncorrelated_b, student_t_interval, relative_half_width, LAG1_THRESHOLD
 
 RESULTS_FOLDER = "results/"
 FINITE_FOLDER = "finite/"
@@ -16,54 +19,63 @@ RESULTS_FINITE_FOLDER = RESULTS_FOLDER + FINITE_FOLDER
 RESULTS_INFINITE_FOLDER = RESULTS_FOLDER + INFINITE_FOLDER
 
 
-# Exponential service-time sampler
+# Exponential service-time sampler (stesso calcolo di rvgs.Exponential,
+# ma sul rngs.Stream passato invece che sullo stream globale selezionato)
 def exp_sample(mean, stream):
-    rngs.selectStream(stream)
     if mean <= 0:
         raise ValueError(f"exp_sample: mean must be > 0, got {mean}")
-    return rvgs.Exponential(mean)
+    return -mean * log(1.0 - stream.random())
 
 
 # Exponential interarrival sampler
 def interarrival_time(rate, stream):
-    rngs.selectStream(stream)
     if rate <= 0:
         raise ValueError(f"interarrival_time: rate must be > 0, got {rate}")
-    return rvgs.Exponential(1.0 / rate)
+    return -(1.0 / rate) * log(1.0 - stream.random())
 
 
-# Routing table
-def next_node_after(server_name, job):
-    c = job.current_class
-    if c == 'Class1':
-        if server_name == 'A': return 'B'
-        elif server_name == 'B': return 'CS'
-    elif c == 'Class2':
-        if server_name == 'A': return 'P'
-        elif server_name == 'P': return 'CS'
-    elif c == 'Class3':
-        if server_name == 'A': return 'SINK'
+# Stream a blocchi per gli arrivi e per ciascun server, a partire dallo
+# stato corrente di un'istanza rngs.RngStreams (non tocca lo stato globale)
+def make_streams(rng, arrival_stream, service_streams):
+    return (rng.getStream(arrival_stream),
+            {name: rng.getStream(index) for name, index in service_streams.items()})
 
-    return 'SINK'
 
+# Estrazioni tra l'inizio di uno stream e quello del successivo (A256 = MULTIPLIER^STREAM_SPACING)
+STREAM_SPACING = 8367782
 
-# Update class after CS
-def do_class_switch(job):
-    if job.current_class == 'Class1':
-        job.current_class = 'Class2'
-    elif job.current_class == 'Class2':
-        job.current_class = 'Class3'
 
-    return job.current_class
+# Stream della replica r: la replica r usa il blocco di stream che segue quello
+# della replica r - 1, raggiunto con un salto diretto (A256^(r * n) mod m).
+# Lo stato iniziale di ogni replica non dipende dalle altre, quindi le repliche
+# si possono eseguire da sole e in qualsiasi ordine. Ogni stream ha al più
+# stream_capacity(n) estrazioni disgiunte con n stream in uso: STREAM_SPACING
+# (~8.4 milioni) fino a 256 stream, meno oltre (~2.3 milioni con 4 stream per
+# 160 repliche), perché gli inizi fanno il giro del periodo e si avvicinano.
+def replication_streams(seed, r, arrival_stream, service_streams):
+    n_streams = 1 + max(arrival_stream, *service_streams.values())
+    rng = rngs.RngStreams(seed)
+    rng.jumpStreams(r * n_streams)
+    return make_streams(rng, arrival_stream, service_streams)
 
-# Calcola metriche a orizzonte finito
+
+# Estrazioni che ogni stream può fare prima di raggiungere l'inizio di un altro,
+# con gli stream di indice 0 .. n_streams - 1 in uso: distanza minima tra due
+# inizi consecutivi (lungo il periodo m - 1) degli stream ottenuti per salto
+def stream_capacity(n_streams):
+    period = rngs.MODULUS - 1
+    starts = np.sort(np.arange(n_streams, dtype=np.int64) * STREAM_SPACING % period)
+    return int(np.diff(np.append(starts, starts[0] + period)).min())
+
+
+# Calcola metriche a orizzonte finito (dalle somme correnti: O(server) per campione)
 def compute_metrics_finite(servers, completed_jobs, t, in_flight):
     metrics = {}
 
     # RT e throughput globali
     n_completed = len(completed_jobs)
     if n_completed > 0 and t > 0:
-        metrics['RT'] = sum(j.finish - j.birth for j in completed_jobs) / n_completed
+        metrics['RT'] = completed_jobs.mean_response_time()
         metrics['Throughput'] = n_completed / t
     else:
         metrics['RT'] = 0.0
@@ -75,15 +87,21 @@ def compute_metrics_finite(servers, completed_jobs, t, in_flight):
         metrics[f'U_{sname}'] = (srv.cumulative_busy_time / t) if t > 0 else 0.0
         metrics[f'Throughput_{sname}'] = (srv.num_departures / t) if t > 0 else 0.0
 
-        # RT per server
-        server_rts = [j.server_times.get(sname, 0.0) for j in completed_jobs]
-        metrics[f'RT_{sname}'] = sum(server_rts)/len(server_rts) if server_rts else 0.0
+        # RT per server (solo se tracciato)
+        if completed_jobs.track_servers:
+            metrics[f'RT_{sname}'] = completed_jobs.mean_server_time(sname)
 
     # numero di richieste in esecuzione nel sistema
     metrics['N_system'] = len(in_flight)
 
     return metrics
 
+# Campioni di una replica come array (campioni, metriche), con i nomi delle metriche
+def metrics_matrix(sampled_metrics):
+    metric_names = list(sampled_metrics[0].keys())
+    values = np.array([[sample[name] for name in metric_names] for sample in sampled_metrics], dtype=float)
+    return metric_names, values
+
 # Calcola metriche a orizzonte infinito
 def compute_metrics_infinite(servers, completed_batch, duration):
     metrics = {}
@@ -91,7 +109,7 @@ def compute_metrics_infinite(servers, completed_batch, duration):
     # --- Global RT & Throughput ---
     n_completed = len(completed_batch)
     if n_completed > 0 and duration > 0:
-        metrics['RT'] = sum(j.finish - j.birth for j in completed_batch) / n_completed
+        metrics['RT'] = completed_batch.mean_response_time()
         metrics['Throughput'] = n_completed / duration
     else:
         metrics['RT'] = 0.0
@@ -103,9 +121,9 @@ def compute_metrics_infinite(servers, completed_batch, duration):
         metrics[f'U_{sname}'] = (srv.cumulative_busy_time / duration) if duration > 0 else 0.0
         metrics[f'Throughput_{sname}'] = (srv.num_departures / duration) if duration > 0 else 0.0
 
-        # Server response times
-        server_rts = [j.server_times.get(sname, 0.0) for j in completed_batch]
-        metrics[f'RT_{sname}'] = sum(server_rts) / len(server_rts) if server_rts else 0.0
+        # Server response times (solo se tracciati)
+        if completed_batch.track_servers:
+            metrics[f'RT_{sname}'] = completed_batch.mean_server_time(sname)
 
     # System-wide number of jobs in system
     if duration > 0:
@@ -114,22 +132,21 @@ def compute_metrics_infinite(servers, completed_batch, duration):
         n_system_avg = 0.0
     metrics['N_system'] = n_system_avg
 
-    # Throughput Bound + Service Demands
-    totals = {}  # server -> total service requested on that server across batch
-
-    for job in completed_batch:
-        for srv, t in job.requested_service.items():
-            totals[srv] = totals.get(srv, 0.0) + t
+    # Throughput Bound + Service Demands (solo se tracciati)
+    if not completed_batch.track_servers:
+        return metrics
 
     if n_completed > 0:
         d_max = 0.0
 
-        for srv in servers:
-            d_i = totals.get(srv, 0.0) / n_completed
-            metrics[f'D_{srv}'] = d_i
+        for sname, srv in servers.items():
+            d_i = completed_batch.mean_requested_service(sname)
+            metrics[f'D_{sname}'] = d_i
 
-            if d_i > d_max:
-                d_max = d_i
+            # collo di bottiglia: demand riferito alla capacità del server (core · velocità)
+            d_eff = d_i / (srv.cores * srv.speed)
+            if d_eff > d_max:
+                d_max = d_eff
 
         thr_max = 1.0 / d_max if d_max > 0 else float('inf')
     else:
@@ -141,69 +158,80 @@ def compute_metrics_infinite(servers, completed_batch, duration):
 
     return metrics
 
-# Salva le statistiche a orizzonte finito in file .dat (un valore per riga)
-def save_finite_metrics(all_replicas_metrics, num_repetitions, scenario):
-    os.makedirs(RESULTS_FINITE_FOLDER, exist_ok=True)
-
-    num_samples = len(all_replicas_metrics[0])
-    metric_keys = all_replicas_metrics[0][0].keys()
+# Esporta ogni colonna nel vecchio formato testuale <colonna>_<scenario>.dat
+# (un valore per riga); delle colonne (repliche, campioni) scrive la media tra le repliche
+def export_text_columns(columns, folder, scenario):
+    os.makedirs(folder, exist_ok=True)
 
-    # Calcola la media tra le repliche per ogni tempo di campionamento
-    for key in metric_keys:
-        avg_values = []
-        for i in range(num_samples):
-            mean_at_i = sum(all_replicas_metrics[r][i][key]
-                            for r in range(num_repetitions)) / num_repetitions
-            avg_values.append(mean_at_i)
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if values.ndim == 2:
+            values = values.mean(axis=0)
 
-        # Salva .dat
-        filename = f"{key}_{scenario}.dat"
-        path = os.path.join(RESULTS_FINITE_FOLDER, filename)
+        path = os.path.join(folder, f"{name}_{scenario}.dat")
         with open(path, "w") as f:
-            for val in avg_values:
+            for val in values.tolist():
                 f.write(f"{val}\n")
 
-    print(f"\n✔ Finite-horizon metrics saved in {RESULTS_FINITE_FOLDER}")
-
-# Salva il numero di arrivi totali al sistema in un file .dat (un valore per riga)
-def save_finite_total_arrivals(arrivals_per_run, scenario):
+# Salva le statistiche a orizzonte finito in finite_<scenario>.npz: l'array denso
+# (repliche, campioni, metriche) di tutte le repliche ('metrics', nomi delle metriche
+# nei metadati) più gli arrivi totali di ogni replica. Medie, varianze e intervalli
+# di confidenza si ricavano dal file (stats.replication_summary), senza nuove simulazioni
+def save_finite_metrics(values, metric_names, arrivals_per_run, scenario, metadata, export_text=False):
     os.makedirs(RESULTS_FINITE_FOLDER, exist_ok=True)
 
-    filename = f"total_arrivals_{scenario}.dat"
-    path = os.path.join(RESULTS_FINITE_FOLDER, filename)
+    columns = {'metrics': values, 'total_arrivals': arrivals_per_run}
+    metadata = {**metadata, 'metric_names': metric_names}
 
-    with open(path, "w") as f:
-        for val in arrivals_per_run:
-            f.write(f"{val}\n")
+    path = os.path.join(RESULTS_FINITE_FOLDER, f"finite_{scenario}.npz")
+    save_run(path, columns, metadata)
+    print(f"\n✔ Finite-horizon metrics saved in {path}")
 
-    print(f"\n✔ Total arrivals per run saved in {path}")
+    if export_text:
+        text_columns = {name: values[:, :, j] for j, name in enumerate(metric_names)}
+        text_columns['total_arrivals'] = arrivals_per_run
+        export_text_columns(text_columns, RESULTS_FINITE_FOLDER, scenario)
+        print(f"✔ Text export saved in {RESULTS_FINITE_FOLDER}")
+
+    return path
 
-# Salva le statistiche a orizzonte infinito in file .dat (un valore per riga)
-def save_infinite_metrics(batch_stats, scenario):
+# Salva le statistiche dei batch a orizzonte infinito in infinite_<scenario>.npz: una
+# colonna (k,) per metrica e, se registrata, la sequenza dei tempi di risposta (rt_stream)
+def save_infinite_metrics(batch_stats, scenario, metadata, rts=None, export_text=False):
     os.makedirs(RESULTS_INFINITE_FOLDER, exist_ok=True)
 
     # Ottieni la lista delle metriche (chiavi del primo batch)
     metric_keys = list(batch_stats[0].keys())
+    columns = {key: [bs[key] for bs in batch_stats] for key in metric_keys}
 
-    for key in metric_keys:
-        filename = f"{key}_{scenario}.dat"
-        path = os.path.join(RESULTS_INFINITE_FOLDER, filename)
+    if export_text:
+        export_text_columns(columns, RESULTS_INFINITE_FOLDER, scenario)
 
-        with open(path, "w") as f:
-            for bs in batch_stats:
-                f.write(f"{bs[key]}\n")
+    if rts is not None:
+        columns['rt_stream'] = np.frombuffer(rts, dtype=np.float64)
+
+    path = os.path.join(RESULTS_INFINITE_FOLDER, f"infinite_{scenario}.npz")
+    save_run(path, columns, metadata)
+    print(f"\n✔ Infinite-horizon metrics saved in {path}")
 
-    print(f"\n✔ Infinite-horizon metrics saved in {RESULTS_INFINITE_FOLDER}")
+    return path
 
-# Salva i tempi di risposta del batch in un file .dat (un valore per riga)
-def save_batch_rts(batch_rts, b, scenario):
+# Salva le medie dei batch per ogni b della ricerca del batch size in
+# batch_search_<scenario>.npz (colonne rt_batch_inf_<b>) e, se disponibile,
+# la sequenza dei tempi di risposta da cui sono state ricavate (rt_stream)
+def save_batch_search(batch_rts_by_b, scenario, metadata, rts=None, export_text=False):
     os.makedirs(RESULTS_INFINITE_FOLDER, exist_ok=True)
-    filename = f"rt_batch_inf_{b}_{scenario}.dat"
-    path = os.path.join(RESULTS_INFINITE_FOLDER, filename)
 
-    with open(path, "w") as f:
-        for rt in batch_rts:
-            f.write(f"{rt}\n")
+    columns = {f"rt_batch_inf_{b}": batch_rts for b, batch_rts in batch_rts_by_b.items()}
+
+    if export_text:
+        export_text_columns(columns, RESULTS_INFINITE_FOLDER, scenario)
+
+    if rts is not None:
+        columns['rt_stream'] = np.frombuffer(rts, dtype=np.float64)
+
+    path = os.path.join(RESULTS_INFINITE_FOLDER, f"batch_search_{scenario}.npz")
+    save_run(path, columns, metadata)
 
     return path
 
@@ -296,14 +324,15 @@ def plot_job_visit_sequence(completed_jobs, scenario):
     plt.tight_layout()
     plt.show()
 
-def plot_throughput_vs_lambda(lambda_values, throughput_values, scenario):
-    thr_max = 1.250741
-
+def plot_throughput_vs_lambda(lambda_values, throughput_values, analytical_values, thr_max, scenario):
     plt.figure(figsize=(9, 5))
 
     # Curva throughput simulato
     plt.plot(lambda_values, throughput_values, marker='o', label="Throughput simulato")
 
+    # Curva throughput analitico
+    plt.plot(lambda_values, analytical_values, color='gray', linestyle=':', label="Throughput analitico")
+
     # Linea del throughput bound analitico
     plt.axhline(y=thr_max, color='r', linestyle='--', linewidth=2,
                 label=f"Throughput bound = {thr_max:.2f}")
@@ -318,7 +347,7 @@ def plot_throughput_vs_lambda(lambda_values, throughput_values, scenario):
     plt.show()
 
 # Stampa a schermo arrivi, completamenti e job ancora in coda
-def print_arrivals_and_completions(total_system_arrivals, completed_jobs, jobs_in_flight, servers):
+def print_arrivals_and_completions(total_system_arrivals, completed_jobs, jobs_in_flight, servers, calendar):
     print("\n============================================================\n")
 
     print(f"ARRIVI TOTALI AL SISTEMA: {total_system_arrivals}")
@@ -332,8 +361,105 @@ def print_arrivals_and_completions(total_system_arrivals, completed_jobs, jobs_i
         print(f"  Completamenti: {srv.num_departures}")
         print(f"  Job residui:   {len(srv.jobs)}")
 
+    print_calendar_stats(calendar)
+
     print("\n============================================================\n")
 
+# Stampa a schermo i contatori del calendario degli eventi
+def print_calendar_stats(calendar):
+    print("\n--- Calendario eventi ---")
+    print(f"  Completamenti programmati: {calendar.scheduled}")
+    print(f"  Completamenti sovrascritti (eventi obsoleti evitati): {calendar.superseded}")
+
+# Stampa a schermo, per ogni b, media, intervallo di confidenza e autocorrelazione a lag 1 dei batch
+def print_batch_size_analysis(rows, k):
+    print(f"\n--- Analisi batch means (k = {k}) ---")
+    print(f"{'b':>8} | {'Media RT':>10} | {'± CI 95%':>10} | {'Lag-1':>7}")
+    for row in rows:
+        print(f"{row['b']:>8} | {row['mean']:>10.4f} | {row['half_width']:>10.4f} | {row['lag1']:>7.3f}")
+
+    b = smallest_uncorrelated_b(rows)
+    if b is not None:
+        print(f"\nb minimo con |lag-1| < {LAG1_THRESHOLD}: {b}")
+    else:
+        print(f"\nNessun b con |lag-1| < {LAG1_THRESHOLD}: servono più completamenti")
+
+# Stampa, per ogni tempo di campionamento, media ± semi-ampiezza e varianza tra le
+# repliche di una metrica (summary da stats.replication_summary)
+def print_replication_summary(metric_name, summary, ts_step):
+    print(f"\n--- {metric_name}: {summary['n']} repliche ---")
+    print(f"{'t [s]':>8} | {'Media':>10} | {'± CI 95%':>10} | {'Varianza':>10}")
+    for i, (mean, half_width, variance) in enumerate(zip(summary['mean'], summary['half_width'],
+                                                         summary['variance'])):
+        print(f"{i * ts_step:>8} | {mean:>10.4f} | {half_width:>10.4f} | {variance:>10.4f}")
+
+# Stampa il risultato dell'arresto sequenziale: batch usati e intervallo sul tempo di risposta
+def print_sequential_stopping(batch_stats, precision, max_batches):
+    rts = [m['RT'] for m in batch_stats]
+    mean, half_width = student_t_interval(rts)
+    relative = half_width / mean if mean else float('inf')
+
+    print(f"\n--- Arresto sequenziale (precisione relativa {precision:.1%}) ---")
+    print(f"Batch usati: {len(rts)} (massimo {max_batches})")
+    print(f"RT = {mean:.4f} ± {half_width:.4f} s (precisione relativa {relative:.2%})")
+    if relative > precision:
+        print("Precisione non raggiunta entro il numero massimo di batch")
+
+# Stampa il risultato dell'arresto sequenziale delle repliche: repliche usate e, per
+# ogni metrica, la peggiore precisione relativa tra i tempi di campionamento
+def print_adaptive_replications(values, metric_names, metrics, precision, max_repetitions):
+    print(f"\n--- Arresto sequenziale delle repliche (precisione relativa {precision:.1%}) ---")
+    print(f"Repliche usate: {values.shape[0]} (massimo {max_repetitions})")
+    missed = []
+    for name in metrics:
+        worst = float(np.max(relative_half_width(values[:, :, metric_names.index(name)])))
+        print(f"{name}: precisione relativa peggiore {worst:.2%}")
+        if worst > precision:
+            missed.append(name)
+    if missed:
+        print(f"Precisione non raggiunta entro il numero massimo di repliche per: {', '.join(missed)}")
+
+# Stampa, per ogni metrica, l'intervallo semplice e quello con variabili di controllo
+# (righe da stats.control_variate_analysis), con la riduzione di varianza ottenuta;
+# dove non sono applicate resta lo stimatore semplice
+def print_control_variates(rows, k):
+    if not rows:
+        return
+    controls = ', '.join(rows[0]['controls']) or 'nessuno'
+    print(f"\n--- Variabili di controllo (k = {k}, controlli: {controls}) ---")
+    print(f"{'Metrica':>10} | {'Media':>10} | {'± CI 95%':>10} | {'Media VC':>10} | {'± CI 95%':>10} | "
+          f"{'Riduzione var.':>14}")
+    for row in rows:
+        reduction = f"{row['variance_reduction']:.1%}" if row['applied'] else "non applicate"
+        print(f"{row['metric']:>10} | {row['mean']:>10.4f} | {row['half_width']:>10.4f} | "
+              f"{row['cv_mean']:>10.4f} | {row['cv_half_width']:>10.4f} | {reduction:>14}")
+
+# Stampa il confronto accoppiato tra due scenari (righe da simulator.compare_scenarios):
+# differenza b - a con il suo intervallo, quello che avrebbero repliche indipendenti
+# e il rapporto tra le varianze (repliche indipendenti equivalenti a una accoppiata)
+def print_scenario_comparison(rows, scenario_a, scenario_b, n):
+    print(f"\n--- Confronto {scenario_b} - {scenario_a} (numeri casuali comuni, {n} repliche) ---")
+    w = max(12, len(scenario_a), len(scenario_b))
+    print(f"{'Metrica':>10} | {scenario_a:>{w}} | {scenario_b:>{w}} | {'Differenza':>10} | {'± CI 95%':>10} | "
+          f"{'± CI indip.':>11} | {'Var. indip./CRN':>15}")
+    for row in rows:
+        print(f"{row['metric']:>10} | {row['mean_a']:>{w}.4f} | {row['mean_b']:>{w}.4f} | {row['mean']:>10.4f} | "
+              f"{row['half_width']:>10.4f} | {row['independent_half_width']:>11.4f} | "
+              f"{row['variance_ratio']:>15.1f}")
+
+# Stampa il confronto tra le medie dei batch e la soluzione analitica (righe da
+# analytical.validate_batches): * segna i valori attesi fuori dall'intervallo di confidenza.
+# saturated: configurazione oltre il throughput bound (metriche infinite omesse)
+def print_model_validation(rows, saturated=False):
+    print("\n--- Confronto con la soluzione analitica ---")
+    if saturated:
+        print("λ oltre il throughput bound: server saturi senza stato stazionario (N e RT omessi)")
+    print(f"{'Metrica':>18} | {'Simulato':>10} | {'± CI 95%':>10} | {'Analitico':>10} | {'Errore':>7}")
+    for row in rows:
+        flag = "" if row['covered'] else " *"
+        print(f"{row['metric']:>18} | {row['mean']:>10.4f} | {row['half_width']:>10.4f} | "
+              f"{row['expected']:>10.4f} | {row['relative_error']:>7.2%}{flag}")
+
 # Stampa a schermo una linea di separazione
 def print_line():
     print("————————————————————————————————————————————————————————————————————————————————————————")
@@ -0,0 +1,109 @@
+from math import isinf
+
+from src.analytical import visit_counts, node_demands, erlang_c, throughput_bound, solve_open, validate_batches
+from src.routing import compile_routing
+
+SERVICE_DEMANDS = {
+    'A': {'Class1': 0.2, 'Class2': 0.4, 'Class3': 0.1},
+    'B': {'Class1': 0.8},
+    'P': {'Class2': 0.4},
+}
+
+ROUTING = {
+    ('A', 'Class1'): [(1.0, 'B', 'Class1')],
+    ('B', 'Class1'): [(1.0, 'A', 'Class2')],
+    ('A', 'Class2'): [(1.0, 'P', 'Class2')],
+    ('P', 'Class2'): [(1.0, 'A', 'Class3')],
+    ('A', 'Class3'): [(1.0, 'SINK', None)],
+}
+
+CORES = {'A': 1, 'B': 1, 'P': 1}
+SPEEDS = {'A': 1.0, 'B': 1.0, 'P': 1.0}
+
+
+def test_light_1fa():
+    print("\n===========================")
+    print("TEST SOLUZIONE ANALITICA (LIGHT 1FA)")
+    print("===========================\n")
+
+    routing = compile_routing(ROUTING, ('A', 'Class1'), SERVICE_DEMANDS)
+    visits = visit_counts(routing)
+    assert abs(visits[routing.server_index['A']].sum() - 3.0) < 1e-12
+    assert abs(visits[routing.server_index['B']].sum() - 1.0) < 1e-12
+
+    demands = node_demands(routing, SERVICE_DEMANDS)
+    assert abs(demands['A'] - 0.7) < 1e-12
+    print("-   Service demand per server:", demands)
+
+    # Collo di bottiglia B: X_max = 1 / 0.8
+    assert abs(throughput_bound(demands, CORES, SPEEDS) - 1.25) < 1e-12
+
+    m = solve_open(1.2, routing, SERVICE_DEMANDS, CORES, SPEEDS)
+    assert abs(m['U_B'] - 0.96) < 1e-12
+    assert abs(m['N_B'] - 24.0) < 1e-9                  # U / (1 - U)
+    assert abs(m['RT_B'] - 20.0) < 1e-9                 # D / (1 - U)
+    assert abs(m['Throughput_A'] - 3.6) < 1e-12         # 3 visite per richiesta
+    assert abs(m['RT'] - (m['RT_A'] + m['RT_B'] + m['RT_P'])) < 1e-12
+    assert abs(m['N_system'] - 1.2 * m['RT']) < 1e-9    # Little
+    print(f"-   RT = {m['RT']:.4f} s, N_system = {m['N_system']:.4f}")
+
+    # Oltre il bound: B saturo (U = 1, N e R infiniti), a valle di B passa solo il
+    # suo throughput: A riceve 1.4 in Class1 e 1.25 in Class2 e Class3
+    m = solve_open(1.4, routing, SERVICE_DEMANDS, CORES, SPEEDS)
+    assert abs(m['Throughput'] - 1.25) < 1e-12
+    assert m['U_B'] == 1.0
+    assert isinf(m['RT']) and isinf(m['N_B']) and isinf(m['N_system'])
+    assert abs(m['U_A'] - (0.2 * 1.4 + 0.5 * 1.25)) < 1e-12
+    assert abs(m['U_P'] - 0.4 * 1.25) < 1e-12
+    assert abs(m['Throughput_A'] - (1.4 + 2 * 1.25)) < 1e-12
+    assert all(m[f'U_{node}'] <= 1.0 for node in routing.server_names)
+    print(f"-   λ = 1.4 oltre il bound: U_A = {m['U_A']:.4f}, U_P = {m['U_P']:.4f}")
+
+    print("\n✅ Test soluzione analitica completato.\n")
+
+
+def test_capacity():
+    print("\n===========================")
+    print("TEST SOLUZIONE ANALITICA CON CORE E VELOCITÀ")
+    print("===========================\n")
+
+    # Erlang-C: con un core è la probabilità di server occupato
+    assert abs(erlang_c(1, 0.5) - 0.5) < 1e-12
+    assert abs(erlang_c(2, 1.0) - 1.0 / 3.0) < 1e-12
+
+    routing = compile_routing(ROUTING, ('A', 'Class1'), SERVICE_DEMANDS)
+
+    # B a velocità 2: come una M/M/1 con D = 0.4
+    m = solve_open(1.4, routing, SERVICE_DEMANDS, CORES, {**SPEEDS, 'B': 2.0})
+    assert abs(m['U_B'] - 0.56) < 1e-12
+    assert abs(m['RT_B'] - 0.4 / 0.44) < 1e-12
+    assert abs(m['Throughput_bound'] - 1.0 / 0.7) < 1e-12   # il collo di bottiglia diventa A
+
+    # B con 2 core: M/M/2 con a = 1.12, N = a + C · ρ / (1 - ρ)
+    m = solve_open(1.4, routing, SERVICE_DEMANDS, {**CORES, 'B': 2}, SPEEDS)
+    a = 1.12
+    assert abs(m['U_B'] - a / 2) < 1e-12
+    assert abs(m['N_B'] - (a + erlang_c(2, a) * 0.56 / 0.44)) < 1e-12
+    print(f"-   2 core: N_B = {m['N_B']:.4f}, RT_B = {m['RT_B']:.4f} s")
+
+    print("\n✅ Test capacità completato.\n")
+
+
+def test_validate_batches():
+    print("\n===========================")
+    print("TEST CONFRONTO BATCH / SOLUZIONE ANALITICA")
+    print("===========================\n")
+
+    batch_stats = [{'RT': 1.0 + 0.1 * (i % 2)} for i in range(10)]
+    rows = validate_batches(batch_stats, {'RT': 1.05, 'N_system': 2.0})
+    assert [row['metric'] for row in rows] == ['RT']
+    assert rows[0]['covered']
+
+    # Valori attesi infiniti (oltre il bound) omessi
+    assert validate_batches(batch_stats, {'RT': float('inf')}) == []
+
+    rows = validate_batches(batch_stats, {'RT': 2.0})
+    assert not rows[0]['covered']
+    assert abs(rows[0]['relative_error'] - 0.475) < 1e-12
+
+    print("\n✅ Test confronto completato.\n")
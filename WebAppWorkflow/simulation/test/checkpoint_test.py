@@ -0,0 +1,27 @@
+import os
+
+from src.simulator import simulate_batches
+
+
+def test_resume_from_checkpoint(tmp_path):
+    print("\n===========================")
+    print("TEST RIPRESA DA CHECKPOINT")
+    print("===========================\n")
+
+    k, b, arrival_rate = 6, 64, 1.2
+    ckpt = os.path.join(tmp_path, "run.pkl")
+
+    # Run interrotta dopo 3 batch: resta il checkpoint del terzo
+    simulate_batches(3, b, arrival_rate, 0, False, True, 1, ckpt)
+    assert os.path.exists(ckpt)
+
+    # Ripresa fino a k batch e confronto con una run senza interruzioni
+    resumed_stats, resumed_rts = simulate_batches(k, b, arrival_rate, 0, False, True, 1, ckpt)
+    full_stats, full_rts = simulate_batches(k, b, arrival_rate, 0, False, True, 1)
+
+    assert len(resumed_stats) == k
+    assert resumed_stats == full_stats
+    assert resumed_rts == full_rts
+    print(f"-   {k} batch identici alla run senza interruzioni, {len(full_rts)} tempi di risposta")
+
+    print("\n✅ Test ripresa da checkpoint completato.\n")
@@ -1,4 +1,4 @@
-from src.entities import PSServer, Job
+from src.entities import PSServer, Job, Clock
 
 
 def test_processor_sharing():
@@ -27,9 +27,10 @@ def test_processor_sharing():
     print("-   Job to complete = 0\n")
 
     print("--> Risultati:")
-    print("-   Remaining:", j1.remaining)
+    print("-   Remaining:", srv.remaining(j1))
     print("-   Next departure time at:", srv.next_departure_time(delta_t))
     print("-   Job to complete:", srv._job_to_complete().id, "\n")
+    assert srv._job_to_complete().id == 0
 
     print("---------------------------\n")
 
@@ -38,8 +39,8 @@ def test_processor_sharing():
     # CASO 2 — 2 JOB
     # -------------------------
     srv = PSServer("B")
-    j1 = Job(0.0)
-    j2 = Job(0.0)
+    j1 = Job(0.0, job_id=1)
+    j2 = Job(0.0, job_id=2)
     service_time1 = 15.0
     service_time2 = 10.0
     print(f">>> CASO 2: 2 job che arrivano al server {srv.name} nello stesso istante")
@@ -59,9 +60,10 @@ def test_processor_sharing():
     print("-   Job to complete = 2\n")
 
     print("--> Risultati:")
-    print(f"-   Remaining (Job 1, Job 2): ({j1.remaining}, {j2.remaining})")
+    print(f"-   Remaining (Job 1, Job 2): ({srv.remaining(j1)}, {srv.remaining(j2)})")
     print("-   Next departure time at:", srv.next_departure_time(delta_t))
     print("-   Job to complete:", srv._job_to_complete().id, "\n")
+    assert srv._job_to_complete().id == 2
 
     print("---------------------------\n")
 
@@ -73,9 +75,9 @@ def test_processor_sharing():
     t1 = 0.0
     t2 = 0.8
     t3 = 1.3
-    j1 = Job(t1)
-    j2 = Job(t2)
-    j3 = Job(t3)
+    j1 = Job(t1, job_id=3)
+    j2 = Job(t2, job_id=4)
+    j3 = Job(t3, job_id=5)
     service_time1 = 7.6
     service_time2 = 8.0
     service_time3 = 6.5
@@ -100,9 +102,10 @@ def test_processor_sharing():
     print("-   Job to complete = 5\n")
 
     print("--> Risultati:")
-    print(f"-   Remaining (Job 1, Job 2, Job 3): ({j1.remaining}, {j2.remaining}, {j3.remaining})")
+    print(f"-   Remaining (Job 1, Job 2, Job 3): ({srv.remaining(j1)}, {srv.remaining(j2)}, {srv.remaining(j3)})")
     print("-   Next departure time at:", srv.next_departure_time(delta_t))
     print("-   Job to complete:", srv._job_to_complete().id, "\n")
+    assert srv._job_to_complete().id == 5
 
     print("---------------------------\n")
 
@@ -111,3 +114,57 @@ def test_processor_sharing():
 
 # Esegui il test
 test_processor_sharing()
+
+
+def test_multi_core_speed():
+    print("\n===========================")
+    print("TEST PS MULTI-CORE CON FATTORE DI VELOCITÀ")
+    print("===========================\n")
+
+    # Velocità 2: 10 s di servizio a velocità 1 in 5 s
+    srv = PSServer("B", speed=2.0)
+    j1 = Job(0.0)
+    srv.process_arrival(j1, 10.0)
+    assert srv.next_departure_time(0.0) == 5.0
+    print("-   Velocità 2, servizio 10: completamento a", srv.next_departure_time(0.0))
+
+    # 2 core: con 2 job ognuno ha un core intero, con 3 job ognuno 2/3 di core
+    srv = PSServer("B", cores=2)
+    j1, j2, j3 = Job(0.0), Job(0.0), Job(0.0)
+    srv.process_arrival(j1, 1.0)
+    srv.process_arrival(j2, 2.0)
+    assert srv.next_departure_time(0.0) == 1.0
+
+    srv.process_arrival(j3, 2.0)
+    srv.update_progress(0.75)   # 0.75 · 2/3 = 0.5 di servizio a ciascun job
+    assert abs(srv.remaining(j1) - 0.5) < 1e-12
+    assert abs(srv.next_departure_time(0.75) - 1.5) < 1e-12
+    print("-   2 core, 3 job: prossimo completamento a", srv.next_departure_time(0.75))
+
+    # Utilizzazione come frazione dei core occupati: 3 job su 2 core → 1
+    assert abs(srv.cumulative_busy_time - 0.75) < 1e-12
+
+    srv.update_progress(1.5)
+    assert srv.process_completion() is j1
+    assert abs(srv.remaining(j2) - 1.0) < 1e-12
+    assert abs(srv.next_departure_time(1.5) - 2.5) < 1e-12   # 2 job, un core ciascuno
+    srv.update_progress(2.5)
+    assert abs(srv.remaining(j3)) < 1e-12
+    assert abs(srv.cumulative_busy_time - 2.5) < 1e-12
+    print("-   Dopo il completamento: 1 core per job")
+
+    print("\n✅ Test PS multi-core completato.\n")
+
+
+def test_job_ids_per_run():
+    print("\n===========================")
+    print("TEST ID DEI JOB PER RUN")
+    print("===========================\n")
+
+    # Ogni run numera i propri job: un secondo clock non tocca il contatore del primo
+    clock1, clock2 = Clock(), Clock()
+    assert [clock1.new_job_id() for _ in range(3)] == [0, 1, 2]
+    assert clock2.new_job_id() == 0
+    assert clock1.new_job_id() == 3
+
+    print("\n✅ Test id dei job completato.\n")
@@ -0,0 +1,46 @@
+import os
+
+from src.results_io import save_run
+from src.result_cache import cache_load, cache_store, config_hash
+
+
+def test_cache_hit_and_lru_eviction(tmp_path):
+    print("\n===========================")
+    print("TEST CACHE DEI RISULTATI")
+    print("===========================\n")
+
+    cache = os.path.join(tmp_path, "cache")
+    metadata = {'seed': 987654321, 'scenario': "light_1FA", 'arrival_rate': 1.2, 'b': 8192, 'k': 128}
+
+    # La chiave non dipende dall'ordine dei campi, ma cambia con qualsiasi valore
+    assert config_hash(metadata) == config_hash(dict(reversed(list(metadata.items()))))
+    assert config_hash(metadata) != config_hash({**metadata, 'b': 4096})
+    assert cache_load(metadata, cache) is None
+
+    paths = []
+    for i in range(3):
+        path = os.path.join(tmp_path, f"run_{i}.npz")
+        save_run(path, {'RT': [float(i)] * 100}, {**metadata, 'k': i})
+        paths.append(path)
+    entry_size = os.path.getsize(paths[0])
+
+    # Due voci entrano nel limite; gli mtime sono fissati a mano (k = 0 più vecchia
+    # di k = 1), senza dipendere dalla risoluzione del filesystem
+    cache_store({**metadata, 'k': 0}, paths[0], 2 * entry_size, cache)
+    cache_store({**metadata, 'k': 1}, paths[1], 2 * entry_size, cache)
+    for k, mtime in ((0, 1000), (1, 2000)):
+        os.utime(os.path.join(cache, f"{config_hash({**metadata, 'k': k})}.npz"), (mtime, mtime))
+
+    # La lettura rende la prima la più recente (mtime attuale)
+    columns, cached_metadata = cache_load({**metadata, 'k': 0}, cache)
+    assert columns['RT'][0] == 0.0 and cached_metadata['k'] == 0
+    print("-   Voce k = 0 ripresa dalla cache")
+
+    # La terza voce fa eliminare quella usata meno di recente (k = 1)
+    cache_store({**metadata, 'k': 2}, paths[2], 2 * entry_size, cache)
+    assert cache_load({**metadata, 'k': 1}, cache) is None
+    assert cache_load({**metadata, 'k': 0}, cache) is not None
+    assert cache_load({**metadata, 'k': 2}, cache) is not None
+    print("-   Eliminata la voce usata meno di recente (k = 1)")
+
+    print("\n✅ Test cache dei risultati completato.\n")
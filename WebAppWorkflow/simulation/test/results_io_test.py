@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+from src.results_io import save_run, load_run
+
+
+def test_save_and_load_run(tmp_path):
+    print("\n===========================")
+    print("TEST FILE DEI RISULTATI (.npz mappato in memoria)")
+    print("===========================\n")
+
+    rt = np.arange(12, dtype=np.float64).reshape(3, 4) / 7.0   # 3 repliche x 4 campioni
+    arrivals = [4310, 4295, 4322]
+    metadata = {'seed': 987654321, 'scenario': "light_1FA", 'arrival_rate': 1.2, 'b': 8192, 'k': 128}
+
+    path = os.path.join(tmp_path, "finite_test.npz")
+    save_run(path, {'RT': rt, 'total_arrivals': arrivals, 'empty': []}, metadata)
+
+    columns, loaded_metadata = load_run(path)
+    assert loaded_metadata == metadata
+    print("-   Metadati:", loaded_metadata)
+
+    # Le colonne sono mappate sul file, con shape e valori originali
+    assert isinstance(columns['RT'], np.memmap)
+    assert columns['RT'].shape == (3, 4)
+    assert np.array_equal(columns['RT'], rt)
+    assert np.mean(columns['RT'], axis=0).tolist() == rt.mean(axis=0).tolist()
+    print("-   Colonna RT:", columns['RT'].shape)
+
+    assert columns['total_arrivals'].tolist() == arrivals
+    assert columns['empty'].shape == (0,)
+
+    print("\n✅ Test file dei risultati completato.\n")
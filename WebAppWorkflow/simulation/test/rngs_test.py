@@ -0,0 +1,95 @@
+import pickle
+
+from lib.DES import rngs
+
+
+def test_block_stream():
+    print("\n===========================")
+    print("TEST STREAM A BLOCCHI (rngs.Stream)")
+    print("===========================\n")
+
+    seed = 987654321
+    num_draws = 3 * rngs.BLOCK + 17   # attraversa più blocchi
+
+    for index in (0, 1, 2, 3):
+        rng = rngs.RngStreams(seed)
+        stream = rng.getStream(index)
+        assert stream.getSeed() == rng.seed[index]
+
+        rng.selectStream(index)
+        for _ in range(num_draws):
+            assert stream.random() == rng.random()
+        assert stream.getSeed() == rng.getSeed()
+
+        print(f"-   Stream {index}: {num_draws} uniformi identiche a random()")
+
+    print("\n✅ Test stream a blocchi completato.\n")
+
+
+def test_independent_instances():
+    print("\n===========================")
+    print("TEST ISTANZE RngStreams INDIPENDENTI")
+    print("===========================\n")
+
+    # Il modulo (shim) e due istanze con lo stesso seme non si influenzano
+    rngs.plantSeeds(987654321)
+    rng1 = rngs.RngStreams(987654321)
+    rng2 = rngs.RngStreams(987654321)
+
+    rngs.selectStream(2)
+    rng1.selectStream(2)
+    u_module = [rngs.random() for _ in range(100)]
+    u_first = [rng1.random() for _ in range(100)]
+
+    rng2.selectStream(2)
+    u_second = [rng2.random() for _ in range(100)]
+
+    assert u_module == u_first == u_second
+    print("-   Stesse sequenze da modulo e da istanze separate")
+
+    print("\n✅ Test istanze indipendenti completato.\n")
+
+
+def test_jump_ahead():
+    print("\n===========================")
+    print("TEST SALTO IN AVANTI (jump / jumpStreams)")
+    print("===========================\n")
+
+    seed = 987654321
+
+    # jump(i, n) equivale a n chiamate a random() sullo stream i
+    rng = rngs.RngStreams(seed)
+    rng.selectStream(1)
+    for _ in range(10000):
+        rng.random()
+    jumped = rngs.RngStreams(seed)
+    jumped.jump(1, 10000)
+    assert jumped.seed[1] == rng.getSeed()
+    print("-   jump(1, 10000) = 10000 chiamate a random()")
+
+    # jumpStreams(n) porta lo stream j dove plantSeeds mette lo stream j + n
+    planted = rngs.RngStreams(seed)
+    jumped = rngs.RngStreams(seed)
+    jumped.jumpStreams(4)
+    assert jumped.seed[:rngs.STREAMS - 4] == planted.seed[4:]
+    print("-   jumpStreams(4) = stream j + 4 di plantSeeds")
+
+    print("\n✅ Test salto in avanti completato.\n")
+
+
+def test_pickled_stream():
+    print("\n===========================")
+    print("TEST STREAM SERIALIZZATO (pickle)")
+    print("===========================\n")
+
+    stream = rngs.RngStreams(987654321).getStream(0)
+    for _ in range(rngs.BLOCK + 5):   # a metà di un blocco
+        stream.random()
+
+    restored = pickle.loads(pickle.dumps(stream))
+    assert restored.getSeed() == stream.getSeed()
+    for _ in range(2 * rngs.BLOCK):
+        assert restored.random() == stream.random()
+    print("-   Lo stream ripristinato prosegue con la stessa sequenza")
+
+    print("\n✅ Test stream serializzato completato.\n")
@@ -0,0 +1,95 @@
+import pytest
+
+from src.routing import compile_routing, pick_branch
+
+SERVICE_DEMANDS = {
+    'A': {'Class1': 0.2, 'Class2': 0.4, 'Class3': 0.1},
+    'B': {'Class1': 0.8},
+    'P': {'Class2': 0.4},
+}
+
+ROUTING = {
+    ('A', 'Class1'): [(1.0, 'B', 'Class1')],
+    ('B', 'Class1'): [(1.0, 'A', 'Class2')],
+    ('A', 'Class2'): [(1.0, 'P', 'Class2')],
+    ('P', 'Class2'): [(1.0, 'A', 'Class3')],
+    ('A', 'Class3'): [(1.0, 'SINK', None)],
+}
+
+
+def test_compile_routing():
+    print("\n===========================")
+    print("TEST TABELLA DI ROUTING COMPILATA")
+    print("===========================\n")
+
+    routing = compile_routing(ROUTING, ('A', 'Class1'), SERVICE_DEMANDS)
+    assert routing.class_names == ['Class1', 'Class2', 'Class3']
+    assert routing.entry == ('A', 0, 0.2)
+    assert not routing.probabilistic
+
+    # Percorso A → B → A (CS) → P → A (CS) → SINK
+    node, job_class = 'A', 0
+    path = [node]
+    while node is not None:
+        (_, node, job_class, _), = routing.routes[routing.server_index[node]][job_class]
+        path.append(node)
+    assert path == ['A', 'B', 'A', 'P', 'A', None]
+    print("-   Percorso:", path)
+
+    # Service demand della destinazione già risolto: B → A in Class2
+    assert routing.routes[routing.server_index['B']][0] == ((1.0, 'A', 1, 0.4),)
+
+    print("\n✅ Test tabella di routing compilata completato.\n")
+
+
+def test_probabilistic_branches():
+    print("\n===========================")
+    print("TEST DIRAMAZIONI PROBABILISTICHE")
+    print("===========================\n")
+
+    table = {**ROUTING, ('A', 'Class2'): [(0.9, 'P', 'Class2'), (0.1, 'SINK', None)]}
+    routing = compile_routing(table, ('A', 'Class1'), SERVICE_DEMANDS)
+    assert routing.probabilistic
+
+    branches = routing.routes[routing.server_index['A']][1]
+    assert pick_branch(branches, 0.5) == ('P', 1, 0.4)
+    assert pick_branch(branches, 0.95) == (None, 1, None)
+    print("-   u = 0.5 → P, u = 0.95 → SINK")
+
+    # Probabilità che non sommano a 1, nodi o service demand mancanti
+    with pytest.raises(ValueError):
+        compile_routing({('A', 'Class1'): [(0.5, 'B', 'Class1')]}, ('A', 'Class1'), SERVICE_DEMANDS)
+    with pytest.raises(ValueError):
+        compile_routing({('A', 'Class1'): [(1.0, 'X', 'Class1')]}, ('A', 'Class1'), SERVICE_DEMANDS)
+    with pytest.raises(ValueError):
+        compile_routing({('A', 'Class1'): [(1.0, 'P', 'Class1')]}, ('A', 'Class1'), SERVICE_DEMANDS)
+
+    print("\n✅ Test diramazioni probabilistiche completato.\n")
+
+
+def test_new_tier_from_configuration():
+    print("\n===========================")
+    print("TEST NUOVO TIER DA CONFIGURAZIONE")
+    print("===========================\n")
+
+    from src.simulator import simulate_finite
+    from src.utils import replication_streams
+
+    # Tier C (es. cache) dopo P: basta aggiungerlo a service demands e routing
+    demands = {**SERVICE_DEMANDS, 'C': {'Class2': 0.1}}
+    table = {**ROUTING, ('P', 'Class2'): [(1.0, 'C', 'Class2')], ('C', 'Class2'): [(1.0, 'A', 'Class3')]}
+    routing = compile_routing(table, ('A', 'Class1'), demands)
+    assert routing.server_names == ['A', 'B', 'P', 'C']
+
+    cores = {name: 1 for name in routing.server_names}
+    speeds = {name: 1.0 for name in routing.server_names}
+    arrival_stream, service_streams = replication_streams(1, 0, 0, {'A': 1, 'B': 2, 'P': 3, 'C': 4})
+    metrics, arrivals, completed_jobs, _, servers, _ = simulate_finite(
+        600, 0.5, routing, arrival_stream, service_streams, 600, cores=cores, speeds=speeds)
+
+    assert sorted(servers) == ['A', 'B', 'C', 'P']
+    assert servers['C'].num_departures > 0
+    assert metrics[-1]['RT_C'] > 0
+    print(f"-   {len(completed_jobs)} job completati, RT_C = {metrics[-1]['RT_C']:.4f} s")
+
+    print("\n✅ Test nuovo tier completato.\n")
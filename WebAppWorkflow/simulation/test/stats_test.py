@@ -0,0 +1,207 @@
+from math import sqrt
+
+import numpy as np
+
+from src.stats import student_t_interval, batch_means, batch_size_analysis, lag1_autocorrelation, \
+    replication_summary, precision_reached, relative_half_width, replication_precision_reached, \
+    control_variate_interval, control_variate_analysis, paired_difference
+
+
+def test_batch_means():
+    print("\n===========================")
+    print("TEST BATCH MEANS DA UN'UNICA SEQUENZA")
+    print("===========================\n")
+
+    values = [float(i) for i in range(64)]
+
+    # 4 batch da 8: medie 3.5, 11.5, 19.5, 27.5
+    means = batch_means(values, 8, 4)
+    assert means.tolist() == [3.5, 11.5, 19.5, 27.5]
+    print("-   Medie dei batch (b = 8, k = 4):", means.tolist())
+
+    # b = 1, 2, 4, ... fino a k * b <= 64
+    rows = batch_size_analysis(values, 4)
+    assert [row['b'] for row in rows] == [1, 2, 4, 8, 16]
+    print("-   Valori di b analizzati:", [row['b'] for row in rows])
+
+    # Sequenza lineare: batch means perfettamente correlati
+    assert lag1_autocorrelation(values) > 0.9
+
+    print("\n✅ Test batch means completato.\n")
+
+
+def test_student_t_interval():
+    print("\n===========================")
+    print("TEST INTERVALLO DI CONFIDENZA STUDENT-t")
+    print("===========================\n")
+
+    # n = 2: t*(1, 0.975) = 12.706, stdev = 1, w = t* · 1 / sqrt(1)
+    mean, w = student_t_interval([1.0, 3.0])
+    assert mean == 2.0
+    assert abs(w - 12.7062) < 1e-3
+    print(f"-   Intervallo: {mean} ± {w:.4f}")
+
+    # Semi-ampiezza decrescente come 1/sqrt(n)
+    _, w_small = student_t_interval([1.0, 3.0] * 50)
+    _, w_large = student_t_interval([1.0, 3.0] * 200)
+    assert abs(w_small / w_large - 2.0) < 0.05 * sqrt(2)
+
+    print("\n✅ Test intervallo di confidenza completato.\n")
+
+
+def test_replication_summary():
+    print("\n===========================")
+    print("TEST STATISTICHE LUNGO LE REPLICHE")
+    print("===========================\n")
+
+    # 5 repliche x 3 campioni x 2 metriche
+    values = np.arange(30, dtype=float).reshape(5, 3, 2) ** 1.5
+    summary = replication_summary(values)
+    assert summary['n'] == 5
+    assert summary['mean'].shape == (3, 2)
+
+    # Stessi valori di student_t_interval applicato a ogni (campione, metrica)
+    for i in range(3):
+        for j in range(2):
+            mean, w = student_t_interval(values[:, i, j])
+            assert abs(summary['mean'][i, j] - mean) < 1e-12
+            assert abs(summary['half_width'][i, j] - w) < 1e-12
+            assert abs(summary['variance'][i, j] - np.var(values[:, i, j])) < 1e-12
+    print("-   Medie:", summary['mean'].round(3).tolist())
+
+    print("\n✅ Test statistiche lungo le repliche completato.\n")
+
+
+def test_precision_reached():
+    print("\n===========================")
+    print("TEST CRITERIO DI ARRESTO SEQUENZIALE")
+    print("===========================\n")
+
+    # media 10, stdev 1: w = t*(n-1) / sqrt(n - 1)
+    values = [9.0, 11.0] * 50
+    mean, w = student_t_interval(values)
+    assert precision_reached(values, 1.01 * w / mean)
+    assert not precision_reached(values, 0.99 * w / mean)
+    print(f"-   Precisione relativa raggiunta: {w / mean:.4f}")
+
+    # con media nulla la precisione relativa non è definita
+    assert not precision_reached([-1.0, 1.0], 0.5)
+
+    print("\n✅ Test criterio di arresto sequenziale completato.\n")
+
+
+def test_replication_precision_reached():
+    print("\n===========================")
+    print("TEST PRECISIONE PER TEMPO DI CAMPIONAMENTO")
+    print("===========================\n")
+
+    # 4 repliche x 2 campioni x 2 metriche: il campione a t = 0 è sempre zero
+    rt = np.array([[0.0, 9.0], [0.0, 11.0], [0.0, 9.0], [0.0, 11.0]])
+    noisy = np.array([[0.0, 1.0], [0.0, 30.0], [0.0, 2.0], [0.0, 40.0]])
+    values = np.stack([rt, noisy], axis=2)
+
+    relative = relative_half_width(values[:, :, 0])
+    assert relative[0] == 0.0
+    print(f"-   Precisione relativa di RT a t > 0: {relative[1]:.4f}")
+
+    assert replication_precision_reached(values, ['RT', 'X'], ('RT',), 0.2)
+    assert not replication_precision_reached(values, ['RT', 'X'], ('RT', 'X'), 0.2)
+
+    print("\n✅ Test precisione per tempo di campionamento completato.\n")
+
+
+def test_control_variates():
+    print("\n===========================")
+    print("TEST VARIABILI DI CONTROLLO")
+    print("===========================\n")
+
+    # y = 2 + 3 · (x - 1) + rumore piccolo, con x di media nota 1
+    rng = np.random.default_rng(1)
+    x = rng.exponential(1.0, 200)
+    y = 2.0 + 3.0 * (x - 1.0) + rng.normal(0.0, 0.1, 200)
+
+    mean, half_width = student_t_interval(y)
+    cv_mean, cv_half_width = control_variate_interval(y, x, [1.0])
+    assert abs(cv_mean - 2.0) < cv_half_width < half_width
+    print(f"-   Semplice: {mean:.4f} ± {half_width:.4f}, VC: {cv_mean:.4f} ± {cv_half_width:.4f}")
+
+    # Senza gradi di libertà: media semplice e semi-ampiezza infinita
+    assert control_variate_interval([1.0, 2.0], [[0.0], [1.0]], [0.5]) == (1.5, float('inf'))
+
+    batch_stats = [{'RT': float(yi), 'D_A': float(xi)} for xi, yi in zip(x, y)]
+    rows = control_variate_analysis(batch_stats, ['RT'], {'D_A': 1.0})
+    assert rows[0]['controls'] == ['D_A'] and rows[0]['applied']
+    assert rows[0]['variance_reduction'] > 0.9
+    print(f"-   Riduzione di varianza: {rows[0]['variance_reduction']:.1%}")
+
+    # I controlli sono quelli richiesti, senza selezione sui dati: anche una media nota
+    # sbagliata viene usata (e sposta la stima di β · errore sulla media)
+    rows = control_variate_analysis(batch_stats, ['RT'], {'D_A': 2.0})
+    assert rows[0]['controls'] == ['D_A'] and rows[0]['applied']
+    assert abs(rows[0]['cv_mean'] - (cv_mean + 3.0 * (2.0 - 1.0))) < 0.1
+
+    # Troppo pochi batch per parametro: stimatore semplice
+    rows = control_variate_analysis(batch_stats[:15], ['RT'], {'D_A': 1.0})
+    assert not rows[0]['applied'] and rows[0]['variance_reduction'] == 0.0
+    assert (rows[0]['cv_mean'], rows[0]['cv_half_width']) == (rows[0]['mean'], rows[0]['half_width'])
+
+    # Controllo indipendente dalla metrica: intervallo riportato comunque, anche se
+    # più largo (riduzione negativa)
+    noise = rng.exponential(1.0, 200)
+    batch_stats = [{'RT': float(yi), 'D_A': float(ni)} for ni, yi in zip(noise, y)]
+    rows = control_variate_analysis(batch_stats, ['RT'], {'D_A': 1.0})
+    assert rows[0]['applied'] and rows[0]['cv_mean'] != rows[0]['mean']
+    print(f"-   Controllo indipendente: riduzione {rows[0]['variance_reduction']:.1%}")
+
+    print("\n✅ Test variabili di controllo completato.\n")
+
+
+def test_control_variate_coverage():
+    print("\n===========================")
+    print("TEST COPERTURA VARIABILI DI CONTROLLO")
+    print("===========================\n")
+
+    # Batch i.i.d. con metrica y correlata a un controllo x di media nota: l'intervallo
+    # con variabili di controllo deve contenere la vera media di y nel ~95% dei casi
+    rng = np.random.default_rng(7)
+    n_datasets, n_batches = 2000, 64
+    covered = 0
+    reduction = 0.0
+    for _ in range(n_datasets):
+        x = rng.normal(1.0, 0.5, n_batches)
+        y = 2.0 + 3.0 * (x - 1.0) + rng.normal(0.0, 1.0, n_batches)
+        batch_stats = [{'RT': float(yi), 'Interarrival': float(xi)} for xi, yi in zip(x, y)]
+        row = control_variate_analysis(batch_stats, ['RT'], {'Interarrival': 1.0})[0]
+        assert row['applied']
+        covered += abs(row['cv_mean'] - 2.0) <= row['cv_half_width']
+        reduction += row['variance_reduction'] / n_datasets
+
+    coverage = covered / n_datasets
+    print(f"-   Copertura su {n_datasets} insiemi di {n_batches} batch: {coverage:.3f}")
+    print(f"-   Riduzione di varianza media: {reduction:.1%}")
+
+    # ±3 deviazioni standard della binomiale attorno a 0.95
+    assert abs(coverage - 0.95) <= 3 * sqrt(0.95 * 0.05 / n_datasets)
+    assert reduction > 0.6
+
+    print("\n✅ Test copertura variabili di controllo completato.\n")
+
+
+def test_paired_difference():
+    print("\n===========================")
+    print("TEST CONFRONTO ACCOPPIATO")
+    print("===========================\n")
+
+    # Repliche accoppiate: y = x + 1 + piccolo rumore, con x molto variabile
+    rng = np.random.default_rng(2)
+    x = rng.normal(10.0, 3.0, 32)
+    y = x + 1.0 + rng.normal(0.0, 0.1, 32)
+
+    result = paired_difference(x, y)
+    assert abs(result['mean'] - 1.0) < result['half_width']
+    assert result['half_width'] < result['independent_half_width'] / 10
+    assert result['variance_ratio'] > 100
+    print(f"-   Differenza: {result['mean']:.4f} ± {result['half_width']:.4f} "
+          f"(indipendenti ± {result['independent_half_width']:.4f})")
+
+    print("\n✅ Test confronto accoppiato completato.\n")